@@ -0,0 +1,86 @@
+"""Measure the cold start of the CLI and fail if it exceeds the budget.
+
+Usage: python benchmarks/import_time.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must never be loaded just by starting the CLI
+HEAVY_MODULES = ["pandas", "selenium", "webdriver_manager", "ollama", "torch"]
+
+
+def measure_startup(runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "import main; main.build_parser()"],
+            cwd=ROOT,
+            check=True,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(limit: int = 10) -> list[tuple[int, str]]:
+    """Return the cumulative import times (in µs) reported by -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(.*)", line)
+        if match:
+            imports.append((int(match.group(1)), match.group(2)))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def loaded_heavy_modules() -> list[str]:
+    check = (
+        "import sys, main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check], cwd=ROOT, capture_output=True, text=True
+    )
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = measure_startup(args.runs)
+    median = statistics.median(timings)
+    print(f"CLI cold start: median {median:.1f}ms over {args.runs} runs")
+
+    print("Slowest imports (cumulative):")
+    for cumulative, name in slowest_imports():
+        print(f"  {cumulative / 1000:8.1f}ms  {name.strip()}")
+
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print(f"Heavy modules loaded at startup: {', '.join(heavy)}")
+        sys.exit(1)
+
+    if median > args.budget_ms:
+        print(f"Cold start exceeds the budget of {args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare the throughput and memory of the JSON output writers on a history.
+
+Every writer runs in a fresh process, and its memory is the growth of the process
+RSS while writing, which also covers pydantic-core's allocations in Rust.
+
+Usage: python benchmarks/json_output.py [--sizes 10000 50000]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.listing_memory import synthetic_history
+from models.compact_models import CompactDetails, compact_detail_list_adapter
+from storage.json_writer import write_json_records
+
+
+def stdlib_dump(path: str, details: list[CompactDetails]) -> None:
+    """json.dump of the records as dicts, what analyze_listings attempted"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(compact_detail_list_adapter.dump_python(details), f, indent=2)
+
+
+def adapter_dump(path: str, details: list[CompactDetails]) -> None:
+    """The previous scrape_details: one dump_json of the list, decoded, written"""
+    with open(path, "w", encoding="utf-8") as f:
+        json_string = compact_detail_list_adapter.dump_json(details, indent=2)
+        f.write(json_string.decode("utf-8"))
+
+
+def streamed(path: str, details: list[CompactDetails]) -> None:
+    write_json_records(path, details, CompactDetails)
+
+
+def streamed_compact(path: str, details: list[CompactDetails]) -> None:
+    write_json_records(path, details, CompactDetails, compact=True)
+
+
+WRITERS = [
+    ("json.dump", stdlib_dump),
+    ("dump_json", adapter_dump),
+    ("streamed", streamed),
+    ("compact", streamed_compact),
+]
+
+
+def _peak_rss_growth(process: psutil.Process, run) -> tuple[float, int]:
+    """Run `run`, sampling the RSS meanwhile; its duration and the peak growth"""
+    baseline = process.memory_info().rss
+    peak = baseline
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak = max(peak, process.memory_info().rss)
+    return elapsed, peak - baseline
+
+
+def _measure_in_process(
+    name: str, size: int, directory: str
+) -> tuple[float, float, float]:
+    writer = dict(WRITERS)[name]
+    details = compact_detail_list_adapter.validate_json(synthetic_history(size))
+    gc.collect()
+    path = os.path.join(directory, f"{name}.json")
+    elapsed, growth = _peak_rss_growth(psutil.Process(), lambda: writer(path, details))
+    return elapsed, growth / 1024 / 1024, os.path.getsize(path) / 1024 / 1024
+
+
+def measure(name: str, size: int, directory: str) -> tuple[float, float, float]:
+    """Return the write time (s), peak RSS growth (MB) and file size (MB)"""
+    # A fresh process, so memory freed by an earlier writer can't hide the growth
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_in_process, (name, size, directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"{size} listings:")
+        with tempfile.TemporaryDirectory() as directory:
+            for name, _ in WRITERS:
+                seconds, peak_mb, file_mb = measure(name, size, directory)
+                print(
+                    f"  {name:>9}: {seconds:6.2f}s, {file_mb / seconds:6.1f}MB/s, "
+                    f"peak {peak_mb:6.1f}MB, file {file_mb:6.1f}MB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare the memory of pydantic ApartmentDetails and CompactDetails histories.
+
+Usage: python benchmarks/listing_memory.py [--sizes 10000 100000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.apartment_models import apartment_detail_list_adapter
+from models.compact_models import compact_detail_list_adapter
+
+CITIES = ["4051 Basel", "4052 Basel", "4053 Basel", "4055 Basel", "4102 Binningen"]
+FEATURES = ["Balkon", "Lift", "Geschirrspüler", "Waschmaschine", "Haustiere erlaubt"]
+
+
+def synthetic_history(size: int) -> bytes:
+    """A details JSON file like output/apartments_details.json with `size` entries"""
+    rng = random.Random(42)
+    records = []
+    for i in range(size):
+        city = rng.choice(CITIES)
+        records.append(
+            {
+                "title": f"{rng.choice([2.5, 3, 3.5, 4])} Zimmer Wohnung {i}",
+                "price": f"CHF {rng.randrange(1200, 2300, 10)}.–",
+                "location": city,
+                "url": f"https://flatfox.ch/de/flat/{i}/",
+                "price_details": None,
+                "description": f"Schöne Wohnung Nummer {i} " * 20,
+                "street": f"Musterstrasse {i % 200}",
+                "city": city,
+                "area": float(rng.randrange(60, 120)),
+                "area_text": None,
+                "available_from": rng.choice(["Sofort", "01.05.2025", "01.06.2025"]),
+                "floor": rng.randrange(0, 6),
+                "rooms": 3.5,
+                "features": rng.sample(FEATURES, 3),
+                "description_features": [],
+                "property_details": {"etage": "2. Etage", "bezugstermin": "Sofort"},
+                "image_urls": [
+                    f"https://flatfox.ch/media/{i}/{n}.jpg" for n in range(10)
+                ],
+            }
+        )
+    return json.dumps(records).encode("utf-8")
+
+
+def measure(adapter, data: bytes) -> tuple[float, float]:
+    """Return the retained memory (MB) and load time (s) of validating `data`"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = adapter.validate_json(data)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return retained / 1024 / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        data = synthetic_history(size)
+        pydantic_mb, pydantic_s = measure(apartment_detail_list_adapter, data)
+        compact_mb, compact_s = measure(compact_detail_list_adapter, data)
+        print(
+            f"{size:>7} listings: ApartmentDetails {pydantic_mb:7.1f}MB "
+            f"({pydantic_s:.2f}s), CompactDetails {compact_mb:7.1f}MB "
+            f"({compact_s:.2f}s), {pydantic_mb / compact_mb:.1f}x smaller"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare the old full-rewrite overview merge with the indexed delta upsert.
+
+Usage: python benchmarks/overview_merge.py [--history 50000] [--scraped 400]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.apartment_models import ApartmentListing
+from tasks.overview_scraping import LISTING_COLUMNS, _append_rows, merge_listings
+
+CITIES = ["4051 Basel", "4052 Basel", "4053 Basel", "4055 Basel", "4102 Binningen"]
+
+
+def synthetic_listing(rng: random.Random, i: int) -> dict[str, str]:
+    return {
+        "title": f"{rng.choice([2.5, 3, 3.5, 4])} Zimmer Wohnung {i}",
+        "price": f"CHF {rng.randrange(1200, 2300, 10)}.–",
+        "location": rng.choice(CITIES),
+        "url": f"https://flatfox.ch/de/flat/{i}/",
+    }
+
+
+def synthetic_run(
+    history_size: int, scraped_size: int
+) -> tuple[pd.DataFrame, list[ApartmentListing]]:
+    """A history and one scrape of the newest listings: half new, a few changed"""
+    rng = random.Random(42)
+    history = pd.DataFrame(
+        [synthetic_listing(rng, i) for i in range(history_size)],
+        columns=LISTING_COLUMNS,
+    )
+
+    scraped = []
+    for i in range(history_size - scraped_size // 2, history_size + scraped_size // 2):
+        listing = synthetic_listing(rng, i)
+        if i < history_size:
+            listing = history.iloc[i].to_dict()
+            if rng.random() < 0.1:
+                listing["price"] = "CHF 999.–"
+        scraped.append(ApartmentListing(**listing))
+    return history, scraped
+
+
+def full_rewrite(
+    existing_df: pd.DataFrame, scraped: list[ApartmentListing], output_file: str
+) -> list[ApartmentListing]:
+    """The previous scrape_overview: concat, dedupe, rewrite, rebuild every row"""
+    new_df = pd.DataFrame([apt.model_dump() for apt in scraped])
+    apartments_df = pd.concat([existing_df, new_df], ignore_index=True)
+    apartments_df = apartments_df.drop_duplicates(subset=["url"], keep="first")
+    apartments_df.to_csv(output_file, index=False)
+    return [
+        ApartmentListing(**{str(k): v for k, v in d.items()})
+        for d in apartments_df.to_dict(orient="records")
+    ]
+
+
+def delta_upsert(
+    existing_df: pd.DataFrame, scraped: list[ApartmentListing], output_file: str
+) -> list[ApartmentListing]:
+    """The current scrape_overview: indexed merge, append and build only the delta"""
+    scraped_df = pd.DataFrame(
+        [apt.model_dump() for apt in scraped], columns=LISTING_COLUMNS
+    )
+    delta_df, _ = merge_listings(existing_df, scraped_df)
+    _append_rows(delta_df, output_file)
+    return [
+        ApartmentListing.model_construct(**record)
+        for record in delta_df.to_dict(orient="records")
+    ]
+
+
+def measure(merge, existing_df, scraped, repeat: int) -> tuple[float, int]:
+    """Best time (s) over `repeat` runs, and the number of listings handed on"""
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, "apartments_basic.csv")
+            existing_df.to_csv(output_file, index=False)
+            start = time.perf_counter()
+            apartments = merge(existing_df, scraped, output_file)
+            timings.append(time.perf_counter() - start)
+    return min(timings), len(apartments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, default=50_000)
+    parser.add_argument("--scraped", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    existing_df, scraped = synthetic_run(args.history, args.scraped)
+    for name, merge in [("full rewrite", full_rewrite), ("delta upsert", delta_upsert)]:
+        seconds, handed_on = measure(merge, existing_df, scraped, args.repeat)
+        print(
+            f"{name:>12}: {seconds * 1000:8.1f}ms, "
+            f"{handed_on} listings handed to the detail stage"
+        )
+
+
+if __name__ == "__main__":
+    main()
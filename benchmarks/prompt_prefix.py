@@ -0,0 +1,93 @@
+"""Measure the prompt evaluation a static criteria prefix saves per call.
+
+Needs a running Ollama server (configured like the analyzer via .env). Every
+synthetic apartment is asked about a different subset of the criteria, as
+happens when the text classifier already answered some of them. The previous
+layout put that subset before the context, so the prompt diverged early; the
+current one keeps all criteria in the prefix and names the subset at the end.
+
+Usage: python benchmarks/prompt_prefix.py [--apartments 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CRITERIA
+from image_analyzer import ImageAnalyzer, create_backend
+
+CITIES = ["4051 Basel", "4052 Basel", "4053 Basel", "4055 Basel", "4102 Binningen"]
+
+
+def synthetic_context(rng: random.Random, i: int) -> str:
+    return f"""
+        ## Title
+        {rng.choice([2.5, 3, 3.5, 4])} Zimmer Wohnung {i} in {rng.choice(CITIES)}
+        ## Description
+        {f"Helle Wohnung Nummer {i} mit Balkon und Geschirrspüler. " * 5}
+        ## Features
+        {rng.sample(["Balkon", "Lift", "Geschirrspüler", "Waschmaschine"], 2)}
+        """
+
+
+def previous_prompt(analyzer: ImageAnalyzer, criteria_keys: list[str], context: str):
+    """The criteria prompt before the static prefix: the asked subset came first"""
+    prefix, _ = analyzer._criteria_prefix().split("#START CRITERIA\n")
+    str_criteria = "".join(
+        f"{criterion}: {CRITERIA[criterion].question}\n" for criterion in criteria_keys
+    )
+    return (
+        f"{prefix}#START CRITERIA\n{str_criteria}\n#END CRITERIA\n\n"
+        f"#START CONTEXT\n{context}\n#END CONTEXT"
+    )
+
+
+def measure(backend, prompts: list[str]) -> tuple[float, float]:
+    """Mean prompt tokens evaluated and prompt evaluation seconds per call"""
+    tokens, seconds, calls = (
+        backend.prompt_eval_tokens,
+        backend.prompt_eval_seconds,
+        backend.calls,
+    )
+    for prompt in prompts:
+        # One generated token is enough, only the prompt evaluation is measured
+        backend.generate(prompt, options={"num_predict": 1, "temperature": 0})
+    calls = backend.calls - calls
+    return (
+        (backend.prompt_eval_tokens - tokens) / calls,
+        (backend.prompt_eval_seconds - seconds) / calls,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apartments", type=int, default=10)
+    args = parser.parse_args()
+
+    backend = create_backend()
+    analyzer = ImageAnalyzer(backend=backend)
+    backend.warm_up()
+
+    rng = random.Random(42)
+    jobs = []
+    for i in range(args.apartments):
+        criteria_keys = [key for key in CRITERIA if rng.random() < 0.7]
+        jobs.append((criteria_keys, synthetic_context(rng, i)))
+
+    layouts = [
+        ("previous", [previous_prompt(analyzer, keys, ctx) for keys, ctx in jobs]),
+        ("static prefix", [analyzer._criteria_prompt(keys, ctx) for keys, ctx in jobs]),
+    ]
+    for name, prompts in layouts:
+        tokens, seconds = measure(backend, prompts)
+        print(
+            f"{name:>13}: {tokens:7.0f} prompt tokens evaluated, "
+            f"{seconds * 1000:7.1f}ms prompt evaluation per call"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare page-load time and bandwidth per listing with and without resource blocking.
+
+Uses the listings of the last overview run (output/apartments_basic.csv).
+Usage: python benchmarks/resource_blocking.py [--listings 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from models.apartment_models import ApartmentListing
+from scrapers.browser import measure_page_load
+from scrapers.flatfox_scraper import FlatfoxScraper
+from scrapers.immoscout24_scraper import ImmoScout24Scraper
+
+
+def measure(scraper, apartments: list[ApartmentListing]) -> dict[str, float]:
+    wall_times, load_times, transferred = [], [], []
+    for apartment in apartments:
+        start = time.perf_counter()
+        try:
+            scraper.get_apartment_details(apartment)
+        except Exception as e:
+            print(f"Error loading {apartment.url}: {e}")
+            continue
+        wall_times.append((time.perf_counter() - start) * 1000)
+        load_ms, transferred_bytes = measure_page_load(scraper.driver)
+        load_times.append(load_ms)
+        transferred.append(transferred_bytes)
+
+    if not wall_times:
+        return {}
+
+    return {
+        "wall_ms": statistics.mean(wall_times),
+        "load_ms": statistics.mean(load_times),
+        "kb": statistics.mean(transferred) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=10)
+    args = parser.parse_args()
+
+    df = pd.read_csv("output/apartments_basic.csv")
+    apartments = [ApartmentListing(**d) for d in df.to_dict(orient="records")]
+
+    for scraper_class in [FlatfoxScraper, ImmoScout24Scraper]:
+        results = {}
+        for block in [False, True]:
+            scraper = scraper_class(existing_urls=set(), block_resources=block)
+            try:
+                sample = [a for a in apartments if scraper.is_scraped_by_me(a)]
+                results[block] = measure(scraper, sample[: args.listings])
+            finally:
+                scraper.close()
+
+        if not results[False] or not results[True]:
+            print(f"{scraper_class.__name__}: no listings could be measured")
+            continue
+
+        print(f"{scraper_class.__name__} (mean per listing)")
+        for block, stats in results.items():
+            print(
+                f"  blocking={block!s:5}  wall {stats['wall_ms']:8.0f}ms  "
+                f"load {stats['load_ms']:8.0f}ms  transferred {stats['kb']:8.0f}KB"
+            )
+        print(
+            f"  saved {results[False]['load_ms'] - results[True]['load_ms']:.0f}ms load "
+            f"and {results[False]['kb'] - results[True]['kb']:.0f}KB per listing"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,238 @@
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field
 # Configuration settings for the flatfox scraper
 
 # Search parameters
 FLATFOX_URL = "https://flatfox.ch/de/search/?east=7.737651&is_furnished=false&is_temporary=false&max_price=2250&min_space=68&north=47.625658&ordering=date&south=47.412497&take=48&west=7.496511"
 
-IMMOSCOUT_URL = "https://www.immoscout24.ch/en/real-estate/rent/city-basel?pn=19&r=2000&slf=70&nrf=2.5&map=true&pt=2200"
+# Newest first (o=dateCreated-desc), so paging can stop at the first known page
+IMMOSCOUT_URL = "https://www.immoscout24.ch/en/real-estate/rent/city-basel?o=dateCreated-desc&r=2000&slf=70&nrf=2.5&map=true&pt=2200"
+
+
+class SearchProfile(BaseModel):
+    name: str
+    portal: str  # Matches Scraper.portal, e.g. "flatfox" or "immoscout24"
+    url: str
+
+
+# Every search that is watched - add more bounding boxes / query URLs per portal here
+SEARCH_PROFILES = [
+    SearchProfile(name="basel", portal="flatfox", url=FLATFOX_URL),
+    SearchProfile(name="basel", portal="immoscout24", url=IMMOSCOUT_URL),
+]
+MAX_PARALLEL_BROWSERS = 3  # Browser sessions scraping search profiles at once
+
+
+# Room types images are sorted into before they are described
+ImageClass = Literal[
+    "bathroom", "kitchen", "balcony", "living", "floor_plan", "exterior", "other"
+]
+
+
+# Attributes of image_analyzer.ImageAttributes a criterion can be checked against
+ImageAttribute = Literal[
+    "window_visible", "floor_material", "appliances", "balcony_visible", "light_level"
+]
+
+
+class ImageCheck(BaseModel):
+    """Answers a criterion from the stored image attributes.
+
+    The criterion holds if any relevant image has `attribute` equal to `value`
+    (or containing it, for list attributes); `negate` inverts the result.
+    """
+
+    attribute: ImageAttribute
+    value: Any = True
+    negate: bool = False
 
 
 # Filtering criteria - can be modified as needed
 class Criteria(BaseModel):
     question: str
     use_image_analysis: bool = Field(default=True)
+    # Only images of these room types are asked about the criterion (empty = all)
+    image_classes: list[ImageClass] = Field(default_factory=list)
+    image_check: Optional[ImageCheck] = None
+    # Usually stated in the listing text, so a distilled text classifier may answer
+    text_decidable: bool = False
 
 
 CRITERIA = {
-    "pets_allowed": Criteria(question="are pets allowed?", use_image_analysis=False),
-    "bath_has_window": Criteria(question="does the bathroom have a window?"),
+    "pets_allowed": Criteria(
+        question="are pets allowed?", use_image_analysis=False, text_decidable=True
+    ),
+    "bath_has_window": Criteria(
+        question="does the bathroom have a window?",
+        image_classes=["bathroom"],
+        image_check=ImageCheck(attribute="window_visible"),
+    ),
     "kitchen_floor_not_wood": Criteria(
-        question="is the kitchen floor not made of wood?"
+        question="is the kitchen floor not made of wood?",
+        image_classes=["kitchen"],
+        image_check=ImageCheck(attribute="floor_material", value="wood", negate=True),
+    ),
+    "has_dishwasher": Criteria(
+        question="is there a dishwasher?",
+        image_classes=["kitchen"],
+        image_check=ImageCheck(attribute="appliances", value="dishwasher"),
+        text_decidable=True,
     ),
-    "has_dishwasher": Criteria(question="is there a dishwasher?"),
     "has_washingmachine": Criteria(
-        question="is there a washing machine in the apartment?"
+        question="is there a washing machine in the apartment?",
+        image_classes=["bathroom", "kitchen", "other"],
+        image_check=ImageCheck(attribute="appliances", value="washing_machine"),
+        text_decidable=True,
+    ),
+    "has_balcony": Criteria(
+        question="does it have a balcony?",
+        image_classes=["balcony", "exterior", "floor_plan"],
+        image_check=ImageCheck(attribute="balcony_visible"),
+    ),
+    "sun_drenched": Criteria(
+        question="Is the apartment Sun-drenched?",
+        image_classes=["living", "balcony", "kitchen"],
+        image_check=ImageCheck(attribute="light_level", value="bright"),
     ),
-    "has_balcony": Criteria(question="does it have a balcony?"),
-    "sun_drenched": Criteria(question="Is the apartment Sun-drenched?"),
 }
 
+# Image routing - classify every image first and extract attributes only from
+# images of a room type some criterion applies to
+ROUTE_IMAGES_BY_ROOM = True
+IMAGE_CLASSIFY_SIZE = 384  # Longest side (px) of the thumbnail sent for classifying
+
+# Generation budgets (num_predict, in tokens) per call type
+TOKEN_BUDGETS = {
+    "classify": 16,
+    "attributes": 192,
+    "criteria": 1536,
+    "criteria_verdicts": 384,  # Criteria answers without reasons
+    "summary": 512,
+}
+
+# Criteria calls - the response is streamed and parsed while it is generated, and
+# generation stops once every criterion has its verdict
+STREAM_CRITERIA = True
+CRITERIA_REASONS = True  # Without reasons the response is shorter, but less reliable
+# Only without reasons: stop at the first criterion that is not met, since the
+# apartment is out anyway (the remaining criteria stay unanswered)
+STOP_AT_FAILED_CRITERION = False
+# Re-asks for criteria still missing after a (repaired) response, before giving up
+CRITERIA_REASKS = 1
+
+# Text classifiers - distilled from the LLM answers with `main.py train-classifiers`,
+# they answer text-decidable criteria and abstain below the threshold
+TEXT_CLASSIFIER_FILE = "output/text_classifiers.pkl"
+TEXT_CLASSIFIER_THRESHOLD = 0.9  # Probability needed to answer without the LLM
+TEXT_CLASSIFIER_MIN_EXAMPLES = 20  # LLM labels needed of each answer to train
+
 # OpenAI API configuration for image analysis
 OPENAI_API_KEY = ""  # Set this in .env file or directly here
 
 # Scraping settings
 RESULTS_PER_PAGE = 48
-MAX_PAGES_TO_SCRAPE = 1  # Limit number of pages to scrape
+MAX_PAGES_TO_SCRAPE = 20  # Limit number of pages to scrape
+# Stop paging once this share of a page's listings is already known (None = never).
+# The searches must be sorted newest first (e.g. ordering=date).
+KNOWN_PAGE_STOP_RATIO = 1.0
 HEADLESS_BROWSER = True  # Run browser in headless mode
+
+# Browser settings
+DRIVER_CACHE_FILE = ".cache/edgedriver_path.json"  # Resolved webdriver binary
+DRIVER_CACHE_MAX_AGE_DAYS = 7  # Re-resolve the driver after this many days
+PERSISTENT_BROWSER_PROFILE = False  # Keep cookies and HTTP cache between runs
+BROWSER_PROFILE_DIR = ".cache/browser_profiles"  # One profile per portal
+BROWSER_DISK_CACHE_SIZE = 500 * 1024 * 1024  # Bytes
+
+# Browser recycling - a long-lived browser grows with every page it visits
+BROWSER_RECYCLE_PAGES = 200  # Pages after which a session is restarted (0 = never)
+BROWSER_MAX_RSS_MB = 1500  # Memory of all browser processes that forces a restart
+BROWSER_PAGE_LOAD_TIMEOUT_SECONDS = 30
+BROWSER_SCRIPT_TIMEOUT_SECONDS = 10  # Also bounds the check whether a page hangs
+BROWSER_MEMORY_LOG = "output/browser_memory.csv"  # Memory per session and page
+
+# Resource blocking - image URLs are read from the DOM, so the pixels are never needed
+BLOCK_RESOURCES = True
+BLOCKED_URL_PATTERNS = {
+    # Applied to every portal
+    "default": [
+        "*.jpg",
+        "*.jpeg",
+        "*.png",
+        "*.gif",
+        "*.webp",
+        "*.avif",
+        "*.svg",
+        "*.ico",
+        "*.mp4",
+        "*.woff",
+        "*.woff2",
+        "*.ttf",
+        "*.otf",
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*googlesyndication.com*",
+        "*facebook.net*",
+        "*hotjar.com*",
+        "*bing.com/bat*",
+    ],
+    "flatfox": [
+        "*sentry.io*",
+    ],
+    "immoscout24": [
+        "*adnz.co*",
+        "*smartadserver.com*",
+        "*permutive.com*",
+        "*criteo.com*",
+    ],
+}
+# Patterns removed from the blocked list for a portal (e.g. when a page needs them)
+ALLOWED_URL_PATTERNS = {
+    "flatfox": [],
+    "immoscout24": [],
+}
+
+# Page archive - raw HTML of every fetched page, for re-parsing without the browser
+ARCHIVE_PAGES = True
+PAGE_ARCHIVE_DIR = "output/pages"
+PAGE_ARCHIVE_COMPRESSION_LEVEL = 10  # zstd level, 1 (fast) to 22 (small)
+
+# HTTP detail fetching - server-rendered detail pages skip the browser entirely
+HTTP_DETAIL_FETCH = True
+HTTP_MAX_CONCURRENCY = 16  # Requests in flight across all hosts
+HTTP_REQUESTS_PER_SECOND = {"default": 1.0, "flatfox.ch": 2.0}  # Per host
+HTTP_BURST = 4  # Requests a host may receive at once before rate limiting kicks in
+HTTP_MAX_RETRIES = 4  # On 429, 5xx and connection errors
+HTTP_TIMEOUT_SECONDS = 20
+HTTP_VALIDATOR_CACHE_FILE = ".cache/http_validators.json"  # ETag / Last-Modified
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0"
+
+# JSON outputs - compact files are smaller and faster to write, indented ones readable
+COMPACT_JSON_OUTPUT = False
+
+# Run journal - per-listing stage completion, so a crashed run resumes where it stopped
+RUN_JOURNAL_FILE = "output/run_journal.sqlite"
+DETAIL_CHECKPOINT_EVERY = 16  # Detail pages scraped between two journal writes
+
+# Job queue - `main.py worker <stage>` runs one stage of the pipeline, so scraping
+# and inference can run in separate processes or on separate machines
+JOB_QUEUE_FILE = "output/job_queue.sqlite"
+JOB_MAX_ATTEMPTS = 3  # Leases of a job that failed or expired before giving up
+# Seconds a leased job stays invisible to other workers, per stage
+JOB_VISIBILITY_TIMEOUT_SECONDS = {
+    "overview": 3600,
+    "details": 300,
+    "images": 300,
+    "vision": 900,
+    "criteria": 600,
+}
+WORKER_POLL_SECONDS = 5  # Wait between polls of an empty queue
+IMAGE_CACHE_DIR = "output/images"  # Images fetched by the image stage
+
+# Watch mode - poll the first page of every search and process only new listings
+WATCH_PAGES = 1  # Pages polled per search profile
+WATCH_INTERVAL_SECONDS = 300  # Poll interval while new listings keep appearing
+WATCH_MAX_INTERVAL_SECONDS = 1800  # Upper bound when backing off on quiet polls
+WATCH_BACKOFF_FACTOR = 1.5
+WATCH_LATENCY_LOG = "output/watch_latency.csv"
@@ -3,19 +3,30 @@ from pydantic import BaseModel
 import requests
 import os
 import base64
-from config import CRITERIA
-import ollama
-
+import hashlib
+import io
+import json
+import time
+from typing import Callable, Literal, Optional, get_args
+import config
+from config import CRITERIA, Criteria, ImageClass
+
+from inference.json_repair import repair_json
+from inference.json_stream import JsonObjectStream
+from inference.text_classifier import TextClassifier
 from models.apartment_models import ApartmentDetails
+from models.inference_backend import InferenceBackend
+from storage.run_journal import RunJournal
+
 
 
-# Load environment variables (for Ollama configuration)
-load_dotenv()
+Confidence = Literal["High", "Medium", "Low"]
 
 
 class CriteriaResponse(BaseModel):
     key: str
     question: str
+    confidence: Confidence
     reason: str
     meets_criteria: bool
 
@@ -24,27 +35,326 @@ class CriteriaListResponse(BaseModel):
     criteria: list[CriteriaResponse]
 
 
+class CriteriaVerdict(BaseModel):
+    """A criteria answer without the reason, when reasons aren't needed"""
+
+    key: str
+    confidence: Confidence
+    meets_criteria: bool
+
+
+class CriteriaVerdictList(BaseModel):
+    criteria: list[CriteriaVerdict]
+
+
+class ImageClassResponse(BaseModel):
+    room: ImageClass
+
+
+Appliance = Literal[
+    "dishwasher", "washing_machine", "dryer", "oven", "stove", "fridge", "microwave"
+]
+
+
+class ImageAttributes(BaseModel):
+    """What one photo shows, None where the photo doesn't tell"""
+
+    room: ImageClass
+    confidence: Confidence
+    window_visible: Optional[bool] = None
+    floor_material: Optional[
+        Literal["wood", "laminate", "tile", "stone", "carpet", "vinyl", "concrete"]
+    ] = None
+    appliances: list[Appliance] = []
+    balcony_visible: Optional[bool] = None
+    light_level: Optional[Literal["dark", "medium", "bright"]] = None
+
+
+def check_images(criterion: Criteria, attributes: list[ImageAttributes]) -> bool | None:
+    """Answer a criterion from image attributes, None if no relevant image tells"""
+    check = criterion.image_check
+    if check is None:
+        return None
+
+    hits = []
+    for image in attributes:
+        if criterion.image_classes and image.room not in criterion.image_classes:
+            continue
+        value = getattr(image, check.attribute)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            hits.append(check.value in value)
+        else:
+            hits.append(value == check.value)
+
+    if not hits:
+        return None
+    return any(hits) != check.negate
+
+
+def image_cache_path(image_url: str) -> str:
+    """Where the image stage stores a downloaded image"""
+    name = hashlib.sha1(image_url.encode("utf-8")).hexdigest()
+    return os.path.join(config.IMAGE_CACHE_DIR, name)
+
+
+def create_backend(model_name: str | None = None) -> InferenceBackend:
+    """Create the inference backend selected by INFERENCE_BACKEND (ollama or transformers)"""
+    # Load environment variables (for the inference backend configuration)
+    load_dotenv()
+
+    backend = os.getenv("INFERENCE_BACKEND", "ollama").lower()
+
+    if backend == "ollama":
+        from inference.ollama_backend import OllamaBackend
+        from inference.ollama_pool import OllamaPool
+
+        # OLLAMA_HOSTS lists several servers to spread the requests over
+        hosts = [
+            host.strip()
+            for host in os.getenv("OLLAMA_HOSTS", "").split(",")
+            if host.strip()
+        ]
+        model_name = model_name or os.getenv("OLLAMA_MODEL", "gemma3:4b")
+        keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+        if len(hosts) > 1:
+            return OllamaPool(
+                hosts=hosts,
+                model_name=model_name,
+                keep_alive=keep_alive,
+                parallel_per_host=int(os.getenv("OLLAMA_PARALLEL_PER_HOST", "2")),
+            )
+
+        return OllamaBackend(
+            host=hosts[0]
+            if hosts
+            else os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+            model_name=model_name,
+            keep_alive=keep_alive,
+        )
+
+    if backend == "transformers":
+        from inference.transformers_backend import TransformersBackend
+
+        return TransformersBackend(
+            model_name=model_name
+            or os.getenv("TRANSFORMERS_MODEL", "Qwen/Qwen2.5-VL-3B-Instruct"),
+            device=os.getenv("TRANSFORMERS_DEVICE", "cpu"),
+            batch_size=int(os.getenv("TRANSFORMERS_BATCH_SIZE", "8")),
+        )
+
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+
+def create_escalation_backend() -> InferenceBackend | None:
+    """The larger model uncertain answers are escalated to, if one is configured"""
+    load_dotenv()
+
+    backend = os.getenv("INFERENCE_BACKEND", "ollama").upper()
+    model_name = os.getenv(f"{backend}_ESCALATION_MODEL")
+    if not model_name:
+        return None
+
+    # A missing escalation model only costs accuracy, so the run goes on without
+    try:
+        escalation_backend = create_backend(model_name)
+        if escalation_backend.is_available():
+            return escalation_backend
+        escalation_backend.close()
+        print(f"Warning: escalation model {model_name} is not available")
+    except Exception as e:
+        print(f"Warning: escalation model {model_name} can't be used: {e}")
+    print("Continuing without escalation")
+    return None
+
+
+class RecoveryStats(BaseModel):
+    """Criteria responses that needed repairing, and re-asks for missing answers"""
+
+    responses: int = 0
+    invalid: int = 0
+    repaired: int = 0
+    reasks: int = 0
+    reask_answers: int = 0
+
+
+class TierStats(BaseModel):
+    """Calls to one model of the cascade, and how many answers it settled"""
+
+    calls: int = 0
+    answers: int = 0
+    settled: int = 0
+    seconds: float = 0.0
+
+
+def _criteria_item_model(
+    response_model: type[CriteriaListResponse] | type[CriteriaVerdictList],
+) -> type[CriteriaResponse] | type[CriteriaVerdict]:
+    return response_model.model_fields["criteria"].annotation.__args__[0]
+
+
+def _version(*parts: str) -> str:
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
 class ImageAnalyzer:
-    def __init__(self):
-        # Initialize Ollama configuration
+    def __init__(
+        self,
+        backend: InferenceBackend | None = None,
+        journal: RunJournal | None = None,
+        escalation_backend: InferenceBackend | None = None,
+        text_classifier: TextClassifier | None = None,
+    ):
+        # The backend connects to (or loads) the model, so it is only created on first use
+        self._backend = backend
+        self.journal = journal
+
+        # Answers below High confidence are asked again of the escalation model
+        self._escalation_backend = escalation_backend
+        self._escalation_resolved = escalation_backend is not None
+        self.tier_stats = {"small": TierStats(), "large": TierStats()}
+        self.early_stops = 0
+        self.recovery = RecoveryStats()
+
+        # Text-decidable criteria are answered without the LLM when it is confident
+        self._text_classifier = text_classifier
+        self._text_classifier_resolved = text_classifier is not None
+        self.text_decisions = 0
+
+    @property
+    def backend(self) -> InferenceBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    @property
+    def escalation_backend(self) -> InferenceBackend | None:
+        if not self._escalation_resolved:
+            self._escalation_backend = create_escalation_backend()
+            self._escalation_resolved = True
+        return self._escalation_backend
+
+    @property
+    def text_classifier(self) -> TextClassifier | None:
+        if not self._text_classifier_resolved:
+            self._text_classifier = TextClassifier.load(
+                config.TEXT_CLASSIFIER_FILE, config.TEXT_CLASSIFIER_THRESHOLD
+            )
+            self._text_classifier_resolved = True
+        return self._text_classifier
+
+    @property
+    def model_name(self) -> str:
+        if self.escalation_backend is None:
+            return self.backend.model_name
+        return f"{self.backend.model_name}>{self.escalation_backend.model_name}"
+
+    def warm_up(self) -> None:
+        """Load the models so they are resident before the first real request"""
+        self.backend.warm_up()
+        if self.escalation_backend is not None:
+            self.escalation_backend.warm_up()
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self._backend.close()
+        if self._escalation_backend is not None:
+            self._escalation_backend.close()
+
+    def _generate_batch(
+        self, tier: str, prompts: list[str], images: list[list[str]], **kwargs
+    ) -> list[str]:
+        backend = self.backend if tier == "small" else self.escalation_backend
+        start = time.perf_counter()
+        generated = backend.generate_batch(prompts, images, **kwargs)
+        stats = self.tier_stats[tier]
+        stats.calls += len(prompts)
+        stats.seconds += time.perf_counter() - start
+        return generated
+
+    def _generate_each_on_error(
+        self,
+        generate: Callable[..., list[str]],
+        prompts: list[str],
+        images: list[list[str]],
+        **kwargs,
+    ) -> list[str | None]:
+        """Run a batch call, falling back to one call per image if it fails, so one
+        bad image only loses its own answer (None)"""
         try:
-            self.ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-            self.model_name = os.getenv("OLLAMA_MODEL", "gemma3:4b")
-
-            # Test connection to Ollama
-            models = ollama.list()
-            if not models:
-                raise ConnectionError(
-                    f"Failed to connect to Ollama at {self.ollama_host}"
-                )
-
-            print(f"Connected to Ollama successfully, using model: {self.model_name}")
+            return generate(prompts, images, **kwargs)
         except Exception as e:
-            raise ValueError(f"Failed to initialize Ollama client: {e}")
+            print(f"Error in batch of {len(prompts)} images, retrying one by one: {e}")
+
+        generated: list[str | None] = []
+        for prompt, image in zip(prompts, images):
+            try:
+                generated.append(generate([prompt], [image], **kwargs)[0])
+            except Exception as e:
+                print(f"Error analyzing image: {e}")
+                generated.append(None)
+        return generated
+
+    def report_cascade(self) -> None:
+        """Print how many answers each model settled and how long it took"""
+        if self.text_decisions:
+            print(f"text classifier: {self.text_decisions} answers without the LLM")
+        if self.early_stops:
+            print(
+                f"criteria calls stopped early at a failed criterion: {self.early_stops}"
+            )
+        recovery = self.recovery
+        if recovery.responses:
+            print(
+                f"criteria responses: {recovery.invalid}/{recovery.responses} invalid, "
+                f"{recovery.repaired} repaired, {recovery.reasks} re-asks "
+                f"recovered {recovery.reask_answers} answers"
+            )
+        for tier, stats in self.tier_stats.items():
+            if not stats.calls:
+                continue
+            print(
+                f"{tier} model: {stats.calls} calls, {stats.settled}/{stats.answers} "
+                f"answers settled ({stats.settled / max(stats.answers, 1):.0%}), "
+                f"{stats.seconds / stats.calls:.2f}s per call"
+            )
+
+    def criteria_version(self) -> str:
+        """Identifies the model and criteria that produced a result"""
+        criteria = json.dumps({k: v.model_dump() for k, v in CRITERIA.items()})
+        return _version(self.model_name, criteria)
+
+    def image_version(self, prompt: str) -> str:
+        """Identifies the model and prompt that produced an image description"""
+        return _version(self.model_name, prompt)
+
+    def fetch_images(self, image_urls: list[str]) -> int:
+        """Download images into IMAGE_CACHE_DIR, so the vision stage reads them
+        from disk. Returns how many were downloaded, cached images are skipped."""
+        os.makedirs(config.IMAGE_CACHE_DIR, exist_ok=True)
+        fetched = 0
+        for image_url in image_urls:
+            path = image_cache_path(image_url)
+            if os.path.exists(path) or os.path.exists(image_url):
+                continue
+            response = requests.get(image_url, timeout=30)
+            response.raise_for_status()
+            # Written under a temporary name, so readers never see half an image
+            with open(path + ".tmp", "wb") as f:
+                f.write(response.content)
+            os.replace(path + ".tmp", path)
+            fetched += 1
+        return fetched
 
     def _encode_image(self, image_url):
-        """Convert image to base64 encoding for Ollama API"""
+        """Convert image to base64 encoding for the inference backend"""
         try:
+            # Fetched ahead by the image stage
+            cached_path = image_cache_path(image_url)
+            if os.path.exists(cached_path):
+                with open(cached_path, "rb") as img_file:
+                    return base64.b64encode(img_file.read()).decode("utf-8")
             # If image_url is a local file path
             if os.path.exists(image_url):
                 with open(image_url, "rb") as img_file:
@@ -62,21 +372,15 @@ class ImageAnalyzer:
             print(f"Error encoding image: {e}")
             return None
 
-    def _summarize_images(self, img_descriptions: str) -> str:
-        prompt = f"""Summarize the following apartment details and images.
-        {img_descriptions}
-        """
-
-        response = ollama.generate(
-            model=self.model_name,
-            prompt=prompt,
-            options={
-                "temperature": 0.7,
-                "top_p": 0.9,
-            },
-        )
+    def _thumbnail(self, encoded_image: str) -> str:
+        """Shrink an image for classification, the room type needs no detail"""
+        from PIL import Image
 
-        return response.get("response", "")
+        image = Image.open(io.BytesIO(base64.b64decode(encoded_image)))
+        image.thumbnail((config.IMAGE_CLASSIFY_SIZE, config.IMAGE_CLASSIFY_SIZE))
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
 
     def _summarize_apartment(
         self, text_description: str, image_description: str
@@ -86,24 +390,43 @@ class ImageAnalyzer:
         {image_description}
         """
 
-        response = ollama.generate(
-            model=self.model_name,
-            prompt=prompt,
+        return self.backend.generate(
+            prompt,
             options={
                 "temperature": 0.7,
                 "top_p": 0.9,
+                "num_predict": config.TOKEN_BUDGETS["summary"],
             },
         )
 
-        return response.get("response", "")
+    def decide_by_text(self, apartment_details: ApartmentDetails) -> dict[str, bool]:
+        """The text-decidable criteria the text classifier is confident about"""
+        if self.text_classifier is None:
+            return {}
+        decided = {
+            key: answer
+            for key, answer in self.text_classifier.predict(apartment_details).items()
+            if key in CRITERIA and CRITERIA[key].text_decidable
+        }
+        self.text_decisions += len(decided)
+        return decided
 
     def analyze(
         self, apartment_details: ApartmentDetails
-    ) -> tuple[dict[str, bool], str]:
-        """Analyze context with Ollama using question answering"""
+    ) -> tuple[dict[str, bool], str, dict[str, str]]:
+        """Analyze context with the inference backend using question answering
+
+        Returns the answer to every criterion, a summary, and who answered each
+        criterion ("llm" or "text_classifier").
+        """
+        decided = self.decide_by_text(apartment_details)
+        decided_by = {key: "text_classifier" for key in decided}
+        criteria_keys = [key for key in CRITERIA if key not in decided]
 
-        img_descriptions = self.analyze_images(apartment_details.image_urls)
-        img_descriptions = self._summarize_images(img_descriptions)
+        # Structured image attributes stand in for a free-text summary of the photos
+        img_descriptions = self.analyze_images(
+            apartment_details.image_urls, criteria_keys
+        )
 
         text_descriptions = f"""
         ## Title
@@ -114,107 +437,488 @@ class ImageAnalyzer:
         {apartment_details.features}
         """
 
+        context = text_descriptions + img_descriptions
+
+        # Make API call to the inference backend
+        try:
+            answers: dict[str, CriteriaResponse] = {}
+            try:
+                if criteria_keys:
+                    answers = self._answer_criteria("small", criteria_keys, context)
+            except Exception as e:
+                print(f"Error calling inference backend: {e}")
+
+            # Only what the small model isn't sure about goes to the large one. After
+            # stopping at a failed criterion, the unanswered ones don't matter.
+            failed = self._stop_at_failed() and any(
+                not answer.meets_criteria for answer in answers.values()
+            )
+            uncertain = [
+                key
+                for key in criteria_keys
+                if (key in answers and answers[key].confidence != "High")
+                or (key not in answers and not failed)
+            ]
+            if uncertain and self.escalation_backend is not None:
+                try:
+                    answers.update(self._answer_criteria("large", uncertain, context))
+                except Exception as e:
+                    print(f"Error calling escalation backend: {e}")
+            if criteria_keys and not answers:
+                raise ValueError("Failed to analyze context")
+
+            met_criteria: dict[str, bool] = {}
+            for key in CRITERIA.keys():
+                if key in decided:
+                    met_criteria[key] = decided[key]
+                else:
+                    met_criteria[key] = key in answers and answers[key].meets_criteria
+                if key in answers:
+                    decided_by[key] = "llm"
+        except Exception as e:
+            print(f"Error calling inference backend: {e}")
+            return {key: decided.get(key, False) for key in CRITERIA.keys()}, "", {}
+
+        # The answers stand without a summary
+        try:
+            apartment_summary = self._summarize_apartment(
+                text_description=text_descriptions, image_description=img_descriptions
+            )
+        except Exception as e:
+            print(f"Error summarizing apartment: {e}")
+            apartment_summary = ""
+
+        return met_criteria, apartment_summary, decided_by
+
+    def _answer_criteria(
+        self, tier: str, criteria_keys: list[str], context: str
+    ) -> dict[str, CriteriaResponse]:
+        """Ask for the criteria, then re-ask only those still missing an answer.
+
+        The context already holds the image evidence, so a re-ask costs one text
+        call and no vision.
+        """
+        answers = self._ask_criteria(tier, criteria_keys, context)
+        for _ in range(config.CRITERIA_REASKS):
+            missing = [key for key in criteria_keys if key not in answers]
+            if not missing or (
+                self._stop_at_failed()
+                and any(not answer.meets_criteria for answer in answers.values())
+            ):
+                break
+
+            self.recovery.reasks += 1
+            try:
+                reasked = self._ask_criteria(tier, missing, context)
+            except Exception as e:
+                # The answers of the first call stay valid
+                print(f"Error re-asking criteria {', '.join(missing)}: {e}")
+                break
+            self.recovery.reask_answers += len(reasked)
+            answers.update(reasked)
+        return answers
+
+    def _ask_criteria(
+        self, tier: str, criteria_keys: list[str], context: str
+    ) -> dict[str, CriteriaResponse]:
+        reasons = config.CRITERIA_REASONS
+        response_model = CriteriaListResponse if reasons else CriteriaVerdictList
+        prompt = self._criteria_prompt(criteria_keys, context)
+        options = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_predict": config.TOKEN_BUDGETS[
+                "criteria" if reasons else "criteria_verdicts"
+            ],
+        }
+
+        answers: dict[str, CriteriaResponse] | None = None
+        if config.STREAM_CRITERIA:
+            answers, response = self._stream_criteria(
+                tier, prompt, criteria_keys, response_model, options
+            )
+        else:
+            response = self._generate_batch(
+                tier,
+                [prompt],
+                [[]],
+                format=response_model.model_json_schema(),
+                options=options,
+            )[0]
+
+        # A response that ran to the end is validated as a whole
+        self.recovery.responses += 1
+        if answers is None:
+            answers = self._parse_criteria(response, response_model, criteria_keys)
+        print(f"## PROMPT ## \n {prompt}, \n ## Result ## \n {answers}")
+
+        self._count_answers(tier, [crit.confidence for crit in answers.values()])
+        return answers
+
+    def _criteria_prefix(self) -> str:
+        """The part of every criteria prompt that never changes between apartments.
+
+        It is byte-identical across calls (all criteria, in config order), so a
+        resident model reuses its evaluated tokens and only evaluates the suffix.
+        """
+        reasons = config.CRITERIA_REASONS
+        response_model = CriteriaListResponse if reasons else CriteriaVerdictList
+        instructions = (
+            "2. A detailed reason for your answer, citing specific parts of the text "
+            "or images\n3. A boolean value indicating if the criterion is met\n"
+            if reasons
+            else "2. A boolean value indicating if the criterion is met\n"
+        )
         str_criteria = ""
         for criterion, value in CRITERIA.items():
-            if value.use_image_analysis:
-                str_criteria += f"{criterion}: {value.question}\n"
+            str_criteria += f"{criterion}: {value.question}\n"
 
-        prompt = (
+        return (
             """
 Analyze the entire provided context thoroughly, including the description and all image descriptions. Pay special attention to information mentioned multiple times across different sections. Prioritize textual information over image descriptions when they conflict. Cross-reference details across all sections before answering.
 
 For each criterion, provide:
 1. A confidence level (High/Medium/Low)
-2. A detailed reason for your answer, citing specific parts of the text or images
-3. A boolean value indicating if the criterion is met
 """
-            f"Format the response as a JSON object with the following structure: {CriteriaListResponse.model_json_schema()}"
+            f"{instructions}"
+            f"Format the response as a JSON object with the following structure: {response_model.model_json_schema()}"
             f"#START CRITERIA\n{str_criteria}\n#END CRITERIA\n\n"
-            f"#START CONTEXT\n{text_descriptions + img_descriptions}\n#END CONTEXT"
         )
 
-        # Make API call to Ollama
-        try:
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=prompt,
-                format=CriteriaListResponse.model_json_schema(),
-                options={
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                },
-            )
+    def _criteria_prompt(self, criteria_keys: list[str], context: str) -> str:
+        # Everything that varies per apartment comes after the static prefix
+        return (
+            self._criteria_prefix()
+            + f"#START CONTEXT\n{context}\n#END CONTEXT\n\n"
+            + f"Answer only these criteria: {', '.join(criteria_keys)}\n"
+        )
 
+    def _parse_criteria(
+        self,
+        response: str,
+        response_model: type[CriteriaListResponse] | type[CriteriaVerdictList],
+        criteria_keys: list[str],
+    ) -> dict[str, CriteriaResponse]:
+        """Validate a criteria response, salvaging the valid answers of a broken one"""
+        try:
+            items = response_model.model_validate_json(response).criteria
+        except ValueError:
+            self.recovery.invalid += 1
             if not response:
-                print("Error: Empty response from Ollama")
-                raise ValueError("Failed to analyze context")
+                print("Error: Empty response from inference backend")
+
+            item_model = _criteria_item_model(response_model)
+            items = []
+            for item in JsonObjectStream(depth=3).feed(repair_json(response)):
+                try:
+                    items.append(item_model.model_validate(item))
+                except ValueError:
+                    continue
+            if items:
+                self.recovery.repaired += 1
+
+        return {
+            crit.key: self._criteria_response(crit)
+            for crit in items
+            if crit.key in criteria_keys
+        }
+
+    def _stop_at_failed(self) -> bool:
+        return not config.CRITERIA_REASONS and config.STOP_AT_FAILED_CRITERION
+
+    def _criteria_response(
+        self, answer: CriteriaResponse | CriteriaVerdict
+    ) -> CriteriaResponse:
+        if isinstance(answer, CriteriaResponse):
+            return answer
+        return CriteriaResponse(
+            key=answer.key,
+            question=CRITERIA[answer.key].question,
+            confidence=answer.confidence,
+            reason="",
+            meets_criteria=answer.meets_criteria,
+        )
 
-            result = CriteriaListResponse.model_validate_json(
-                response.get("response", "")
-            )
-            print(f"## PROMPT ## \n {prompt}, \n ## Result ## \n {result}")
+    def _stream_criteria(
+        self,
+        tier: str,
+        prompt: str,
+        criteria_keys: list[str],
+        response_model: type[CriteriaListResponse] | type[CriteriaVerdictList],
+        options: dict,
+    ) -> tuple[dict[str, CriteriaResponse] | None, str]:
+        """Stream a criteria call and stop generating at a failed criterion.
+
+        Returns the answers if generation was stopped early, or None with the
+        full response if the model finished on its own.
+        """
+        backend = self.backend if tier == "small" else self.escalation_backend
+        item_model = _criteria_item_model(response_model)
+        parser = JsonObjectStream(depth=3)
+        answers: dict[str, CriteriaResponse] = {}
+
+        start = time.perf_counter()
+        stream = backend.generate_stream(
+            prompt, format=response_model.model_json_schema(), options=options
+        )
+        try:
+            for chunk in stream:
+                for item in parser.feed(chunk):
+                    try:
+                        answer = item_model.model_validate(item)
+                    except ValueError:
+                        continue
+                    if answer.key in criteria_keys:
+                        answers[answer.key] = self._criteria_response(answer)
+
+                # With every verdict in, only the closing brackets are left, so the
+                # stream runs to its end, where Ollama reports the prompt evaluation
+                if (
+                    len(answers) < len(criteria_keys)
+                    and self._stop_at_failed()
+                    and any(not answer.meets_criteria for answer in answers.values())
+                ):
+                    self.early_stops += 1
+                    return answers, parser.text
+            return None, parser.text
+        finally:
+            stream.close()
+            stats = self.tier_stats[tier]
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - start
+
+    def _count_answers(self, tier: str, confidences: list[Confidence]) -> None:
+        stats = self.tier_stats[tier]
+        stats.answers += len(confidences)
+        if tier == "large" or self.escalation_backend is None:
+            # The last tier settles whatever it answers
+            stats.settled += len(confidences)
+        else:
+            stats.settled += confidences.count("High")
+
+    def classify_images(
+        self, image_urls: list[str], encoded_images: dict[str, str | None]
+    ) -> dict[str, ImageClass]:
+        """Sort images into room types with one short, low resolution call each.
+
+        Images that could not be classified are left out, so they are routed to
+        every criterion.
+        """
+        prompt = self._classify_prompt()
+        version = self.image_version(prompt) if self.journal is not None else ""
+        classes: dict[str, ImageClass] = {}
+        if self.journal is not None:
+            for img_url in image_urls:
+                room = self.journal.image_description(img_url, version)
+                if room is not None:
+                    classes[img_url] = room  # type: ignore[assignment]
+
+        thumbnails: dict[str, str] = {}
+        for url in image_urls:
+            if url in classes or not encoded_images[url]:
+                continue
+            try:
+                thumbnails[url] = self._thumbnail(encoded_images[url])
+            except Exception as e:
+                # Not an image PIL can read, e.g. an error page; left unclassified
+                print(f"Error shrinking image {url}: {e}")
+
+        pending_urls = list(thumbnails)
+        generated = self._generate_each_on_error(
+            self.backend.generate_batch,
+            [prompt] * len(pending_urls),
+            [[thumbnails[url]] for url in pending_urls],
+            format=ImageClassResponse.model_json_schema(),
+            options={
+                "temperature": 0,
+                "num_predict": config.TOKEN_BUDGETS["classify"],
+            },
+        )
 
-            # Process results
-            met_criteria: dict[str, bool] = {}
-            result_dict = {}
-            for crit in result.criteria:
-                result_dict[crit.key] = crit.meets_criteria
+        for img_url, response in zip(pending_urls, generated):
+            if response is None:
+                continue
+            room = self._parse_image_class(response)
+            if room is None:
+                continue
+            classes[img_url] = room
+            if self.journal is not None:
+                self.journal.save_image_description(img_url, version, room)
+
+        return classes
+
+    def image_attributes(
+        self, image_urls: list[str], criteria_keys: list[str] | None = None
+    ) -> dict[str, ImageAttributes]:
+        """Extract the attributes of every relevant image, in one batch call.
+
+        Attributes are journaled by the hash of the image, so a photo reposted
+        under another URL, or a criterion added later, never needs vision again.
+        With ROUTE_IMAGES_BY_ROOM, images of room types no criterion applies to
+        are only classified.
+        """
+        encoded_images = {url: self._encode_image(url) for url in image_urls}
+
+        classes: dict[str, ImageClass] = {}
+        if config.ROUTE_IMAGES_BY_ROOM:
+            classes = self.classify_images(image_urls, encoded_images)
+
+        relevant_urls = [
+            url
+            for url in image_urls
+            if encoded_images[url]
+            and self._routed_criteria(classes.get(url), criteria_keys)
+        ]
+        if len(relevant_urls) < len(image_urls):
+            print(
+                f"Extracting attributes of {len(relevant_urls)} of {len(image_urls)} "
+                "images, the rest are relevant to no criterion"
+            )
 
-            for key in CRITERIA.keys():
-                met_criteria[key] = result_dict.get(key, False)
+        prompt = self._attributes_prompt()
+        version = self.image_version(prompt)
+        hashes = {
+            url: hashlib.sha256(encoded_images[url].encode("utf-8")).hexdigest()
+            for url in relevant_urls
+        }
+
+        attributes: dict[str, ImageAttributes] = {}
+        if self.journal is not None:
+            for img_url in relevant_urls:
+                payload = self.journal.image_attributes(hashes[img_url], version)
+                if payload is not None:
+                    attributes[img_url] = ImageAttributes.model_validate_json(payload)
+
+        pending_urls = [url for url in relevant_urls if url not in attributes]
+        extracted = self._extract_attributes(
+            "small", pending_urls, encoded_images, prompt
+        )
 
-            apartment_summary = self._summarize_apartment(
-                text_description=text_descriptions, image_description=img_descriptions
+        # Photos the small model isn't sure about are looked at by the large one
+        uncertain = [
+            url
+            for url in pending_urls
+            if url not in extracted or extracted[url].confidence != "High"
+        ]
+        if uncertain and self.escalation_backend is not None:
+            extracted.update(
+                self._extract_attributes("large", uncertain, encoded_images, prompt)
             )
 
-            return met_criteria, apartment_summary
+        for img_url, image in extracted.items():
+            attributes[img_url] = image
+            if self.journal is not None:
+                self.journal.save_image_attributes(
+                    hashes[img_url], version, image.model_dump_json()
+                )
 
-        except Exception as e:
-            print(f"Error calling Ollama API: {e}")
-            return {key: False for key in CRITERIA.keys()}, ""
+        return attributes
+
+    def _extract_attributes(
+        self,
+        tier: str,
+        image_urls: list[str],
+        encoded_images: dict[str, str | None],
+        prompt: str,
+    ) -> dict[str, ImageAttributes]:
+        if not image_urls:
+            return {}
+
+        generated = self._generate_each_on_error(
+            lambda prompts, images, **kwargs: self._generate_batch(
+                tier, prompts, images, **kwargs
+            ),
+            [prompt] * len(image_urls),
+            [[encoded_images[url]] for url in image_urls],
+            format=ImageAttributes.model_json_schema(),
+            options={
+                "temperature": 0,
+                "num_predict": config.TOKEN_BUDGETS["attributes"],
+            },
+        )
+
+        attributes: dict[str, ImageAttributes] = {}
+        for img_url, response in zip(image_urls, generated):
+            if response is None:
+                continue
+            try:
+                attributes[img_url] = ImageAttributes.model_validate_json(
+                    repair_json(response)
+                )
+            except ValueError as e:
+                print(f"Error parsing attributes of {img_url}: {e}")
+        self._count_answers(tier, [image.confidence for image in attributes.values()])
+        return attributes
 
-    def analyze_images(self, image_urls: list[str]) -> str:
-        results: str = ""
+    def analyze_images(
+        self, image_urls: list[str], criteria_keys: list[str] | None = None
+    ) -> str:
+        """Image evidence for the criteria prompt, per criterion and per image"""
+        attributes = self.image_attributes(image_urls, criteria_keys)
+        images = list(attributes.values())
+
+        results = "\n## Image evidence\n"
+        for key, criterion in CRITERIA.items():
+            if not criterion.use_image_analysis:
+                continue
+            if criteria_keys is not None and key not in criteria_keys:
+                continue
+            answer = check_images(criterion, images)
+            seen = {None: "not visible on any photo", True: "yes", False: "no"}[answer]
+            results += f"- {criterion.question} {seen}\n"
 
         for i, img_url in enumerate(image_urls):
-            result = self.analyze_single_image(img_url)
-            results += f"""
-            ## Image {i + 1}
-            {result}
-            """
+            if img_url not in attributes:
+                continue
+            image = attributes[img_url]
+            facts = image.model_dump(
+                exclude={"room", "confidence"}, exclude_defaults=True
+            )
+            facts = ", ".join(f"{key}: {value}" for key, value in facts.items())
+            results += f"- Image {i + 1}: {image.room}, {facts or 'nothing else'}\n"
 
         return results
 
-    def analyze_single_image(self, image_url: str) -> str:
-        """Analyze image with Ollama using multimodal API"""
-
-        criteria = "\n".join(map(lambda x: x.question, CRITERIA.values()))
-
-        analysis_prompt = f"""Describe what you see on the image, so the following questions can be answered. Be precise and concise.
-        
-        #START CRITERIA\n{criteria}\n#END CRITERIA\n\n"""
-
-        encoded_image = self._encode_image(image_url)
-
-        if not encoded_image:
-            return "Error: Could not process image"
-
-        try:
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=analysis_prompt,
-                images=[encoded_image],
-                options={
-                    "temperature": 0.7,
-                },
+    def _routed_criteria(
+        self, room: ImageClass | None, criteria_keys: list[str] | None = None
+    ) -> list[Criteria]:
+        """The image criteria an image of `room` can answer (all if unknown)"""
+        return [
+            criterion
+            for key, criterion in CRITERIA.items()
+            if criterion.use_image_analysis
+            and (criteria_keys is None or key in criteria_keys)
+            and (
+                room is None
+                or not criterion.image_classes
+                or room in criterion.image_classes
             )
+        ]
+
+    def _attributes_prompt(self) -> str:
+        return (
+            "Describe this apartment photo: the room type, whether a window is "
+            "visible, the floor material, the appliances you can see, whether a "
+            "balcony or terrace is visible and how bright the room is. "
+            "Use null for anything the photo doesn't show, and rate how confident "
+            "you are (High/Medium/Low). Format the response as a JSON object with "
+            f"the following structure: {ImageAttributes.model_json_schema()}"
+        )
 
-            if not response:
-                print("Error: Empty response from Ollama")
-                return "Error: Failed to analyze image"
-
-            return response.get("response", "")
+    def _classify_prompt(self) -> str:
+        rooms = ", ".join(get_args(ImageClass))
+        return (
+            "Which room type does this apartment photo show? "
+            f"Answer with exactly one of: {rooms}."
+        )
 
-        except Exception as e:
-            print(f"Error analyzing image: {e}")
-            return f"Error: {str(e)}"
+    def _parse_image_class(self, response: str) -> ImageClass | None:
+        try:
+            return ImageClassResponse.model_validate_json(response).room
+        except ValueError:
+            # Backends without structured output answer in plain text
+            answer = response.lower().replace(" ", "_")
+            for room in get_args(ImageClass):
+                if room in answer:
+                    return room
+        return None
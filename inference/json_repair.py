@@ -0,0 +1,102 @@
+import re
+from typing import Callable
+
+FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+PYTHON_LITERAL = re.compile(r"(?<!\w)(True|False|None)(?!\w)")
+DANGLING_KEY = re.compile(r',?\s*"[^"]*"\s*:\s*$')
+# A key whose colon never arrived, or the start of a literal that was cut off
+KEY_WITHOUT_COLON = re.compile(r'(?<=[{,])\s*"[^"]*"\s*$')
+PARTIAL_LITERAL = re.compile(r"(?<![\w\"])(?!(?:true|false|null)$)[A-Za-z]+$")
+
+
+def _strings(text: str) -> tuple[list[tuple[int, int]], bool]:
+    """The (start, end) spans of the strings in `text`, quotes included, and
+    whether the last one is still open at the end"""
+    spans: list[tuple[int, int]] = []
+    start = -1
+    escaped = False
+    for i, char in enumerate(text):
+        if start < 0:
+            if char == '"':
+                start = i
+        elif escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            spans.append((start, i + 1))
+            start = -1
+    if start >= 0:
+        spans.append((start, len(text)))
+    return spans, start >= 0
+
+
+def _unclosed(text: str) -> tuple[list[str], bool, int]:
+    """The brackets still open at the end of `text`, whether a string is, and the
+    index where the first document closes (-1 if none does)"""
+    spans, in_string = _strings(text)
+    stack: list[str] = []
+    position = 0
+    for start, end in [*spans, (len(text), len(text))]:
+        for i in range(position, start):
+            char = text[i]
+            if char in "{[":
+                stack.append("}" if char == "{" else "]")
+            elif char in "}]" and stack:
+                stack.pop()
+                if not stack:
+                    return stack, False, i
+        position = end
+    return stack, in_string, -1
+
+
+def _outside_strings(text: str, fix: Callable[[str], str]) -> str:
+    """Apply `fix` to the parts of `text` between strings, leaving strings as is"""
+    spans, _ = _strings(text)
+    parts: list[str] = []
+    position = 0
+    for start, end in spans:
+        parts.append(fix(text[position:start]))
+        parts.append(text[start:end])
+        position = end
+    parts.append(fix(text[position:]))
+    return "".join(parts)
+
+
+def _fix_tokens(part: str) -> str:
+    part = TRAILING_COMMA.sub(r"\1", part)
+    return PYTHON_LITERAL.sub(lambda match: PYTHON_LITERALS[match.group(1)], part)
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix of the near-valid JSON models tend to produce.
+
+    Strips markdown fences and text around the document, trailing commas and
+    Python literals outside strings, and closes a response that was cut off (e.g.
+    by the token budget), dropping a key or literal whose value never completed.
+    """
+    text = FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start > 0:
+        text = text[start:]
+    text = _outside_strings(text, _fix_tokens)
+
+    stack, in_string, end = _unclosed(text)
+    if end >= 0:
+        # Complete document, anything after its end is chatter
+        return text[: end + 1]
+    if not stack and not in_string:
+        return text
+
+    if in_string:
+        text += '"'
+    else:
+        text = PARTIAL_LITERAL.sub("", text.rstrip())
+    text = text.rstrip()
+    if stack and stack[-1] == "}":
+        text = KEY_WITHOUT_COLON.sub("", text)
+    text = DANGLING_KEY.sub("", text).rstrip().rstrip(",")
+    stack, _, _ = _unclosed(text)
+    return text + "".join(reversed(stack))
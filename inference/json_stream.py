@@ -0,0 +1,47 @@
+import json
+from typing import Any
+
+
+class JsonObjectStream:
+    """Parses a JSON document while it is generated, yielding nested objects early.
+
+    Every object that opens at `depth` (1 = the document itself) is returned by
+    `feed` as soon as its closing brace arrives, e.g. depth 3 for the items of
+    `{"criteria": [{...}, {...}]}`. Objects that fail to parse are skipped.
+    """
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.text = ""
+        self._level = 0
+        self._start = -1
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        objects = []
+        offset = len(self.text)
+        self.text += chunk
+        for i, char in enumerate(chunk, start=offset):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._level += 1
+                if char == "{" and self._level == self.depth:
+                    self._start = i
+            elif char in "}]":
+                if char == "}" and self._level == self.depth and self._start >= 0:
+                    try:
+                        objects.append(json.loads(self.text[self._start : i + 1]))
+                    except ValueError:
+                        pass
+                    self._start = -1
+                self._level -= 1
+        return objects
@@ -0,0 +1,155 @@
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import ollama
+
+from models.inference_backend import InferenceBackend
+
+# A load_duration above this (in seconds) means the model was not resident
+RELOAD_THRESHOLD_SECONDS = 0.5
+
+
+def _parse_keep_alive(value: str) -> float | str:
+    """Ollama accepts keep_alive as seconds or as a duration string (e.g. 30m)"""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class OllamaBackend(InferenceBackend):
+    def __init__(self, host: str, model_name: str, keep_alive: str = "-1"):
+        self.ollama_host = host
+        self.model_name = model_name
+        self.keep_alive = _parse_keep_alive(keep_alive)
+        self.reload_count = 0
+
+        # Tokens Ollama had to evaluate; a cached prompt prefix is not counted
+        self.calls = 0
+        self.prompt_eval_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        # Streams closed before their final chunk, whose prompt evaluation is unknown
+        self.unmeasured_calls = 0
+
+        try:
+            # One client for the whole run, so all calls share a pooled HTTP connection
+            self.client = ollama.Client(host=self.ollama_host)
+
+            # Test connection to Ollama
+            models = self.client.list()
+            if not models:
+                raise ConnectionError(
+                    f"Failed to connect to Ollama at {self.ollama_host}"
+                )
+
+            print(f"Connected to Ollama successfully, using model: {self.model_name}")
+        except Exception as e:
+            raise ValueError(f"Failed to initialize Ollama client: {e}")
+
+    def is_available(self) -> bool:
+        available = {model.model for model in self.client.list().models}
+        return bool({self.model_name, f"{self.model_name}:latest"} & available)
+
+    def warm_up(self) -> None:
+        """Load the model and pin it in memory for the rest of the run"""
+        start = time.perf_counter()
+        # An empty prompt only loads the model, no tokens are generated
+        response = self.client.generate(
+            model=self.model_name, prompt="", keep_alive=self.keep_alive
+        )
+        load_duration = (response.get("load_duration") or 0) / 1e9
+        print(
+            f"Warmed up {self.model_name} in {time.perf_counter() - start:.2f}s "
+            f"(load_duration: {load_duration:.2f}s, keep_alive: {self.keep_alive})"
+        )
+
+    def generate(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Call generate on the shared client, keeping the model pinned"""
+        response = self.client.generate(
+            model=self.model_name,
+            prompt=prompt,
+            images=images or None,
+            format=format,
+            options=options,
+            keep_alive=self.keep_alive,
+        )
+
+        if not response:
+            raise ValueError("Empty response from Ollama")
+        self._record_prompt_eval(response)
+
+        load_duration = (response.get("load_duration") or 0) / 1e9
+        if load_duration > RELOAD_THRESHOLD_SECONDS:
+            self.reload_count += 1
+            print(
+                f"Warning: {self.model_name} was reloaded (load_duration: {load_duration:.2f}s)"
+            )
+
+        return response.get("response", "")
+
+    def generate_stream(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """Stream the response; closing the iterator drops the connection, which
+        makes Ollama stop generating"""
+        stream = self.client.generate(
+            model=self.model_name,
+            prompt=prompt,
+            images=images or None,
+            format=format,
+            options=options,
+            keep_alive=self.keep_alive,
+            stream=True,
+        )
+        done = False
+        try:
+            for chunk in stream:
+                if chunk.get("done"):
+                    done = True
+                    self._record_prompt_eval(chunk)
+                yield chunk.get("response", "")
+        finally:
+            stream.close()
+            if not done:
+                self.unmeasured_calls += 1
+
+    def _record_prompt_eval(self, response) -> None:
+        self.calls += 1
+        self.prompt_eval_tokens += response.get("prompt_eval_count") or 0
+        self.prompt_eval_seconds += (response.get("prompt_eval_duration") or 0) / 1e9
+
+    def close(self) -> None:
+        """Release the pin so Ollama can unload the model after its default expiry"""
+        try:
+            self.client.generate(
+                model=self.model_name,
+                prompt="",
+                keep_alive=os.getenv("OLLAMA_RELEASE_KEEP_ALIVE", "5m"),
+            )
+        except Exception as e:
+            print(f"Error releasing Ollama model: {e}")
+
+        if self.reload_count:
+            print(f"Model {self.model_name} was reloaded {self.reload_count} times")
+        if self.calls:
+            print(
+                f"Model {self.model_name} evaluated "
+                f"{self.prompt_eval_tokens / self.calls:.0f} prompt tokens "
+                f"in {self.prompt_eval_seconds / self.calls:.2f}s per call"
+            )
+        if self.unmeasured_calls:
+            print(
+                f"{self.unmeasured_calls} streamed calls were stopped before their "
+                "prompt evaluation was reported and are not included"
+            )
@@ -0,0 +1,224 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from inference.ollama_backend import OllamaBackend
+from models.inference_backend import InferenceBackend
+
+# Seconds before a failed host is checked again
+HEALTH_CHECK_INTERVAL_SECONDS = 30.0
+
+
+def _is_host_error(error: Exception) -> bool:
+    """Whether a request failed because of the host (unreachable, timed out or a
+    server error), rather than because of the request, which fails on any host"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        # ollama.ResponseError, -1 when the error came inside the response
+        return status_code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class OllamaHost:
+    """One Ollama server of the pool, with its load and health"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.backend: Optional[OllamaBackend] = None
+        self.healthy = False
+        self.next_check = 0.0
+        self.outstanding = 0
+        self.completed = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+
+
+class OllamaPool(InferenceBackend):
+    """Spreads requests over several Ollama servers serving the same model.
+
+    Every request goes to the healthy host with the fewest requests in flight.
+    A host is only used if it serves the model; a host that can't be reached,
+    times out or answers with a server error is taken out and checked again after
+    HEALTH_CHECK_INTERVAL_SECONDS, and the request fails over to the next host.
+    Errors caused by the request itself are raised without failing over.
+    Batches are sent to all hosts at once, `parallel_per_host` requests each
+    (match the servers' OLLAMA_NUM_PARALLEL).
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        model_name: str,
+        keep_alive: str = "-1",
+        parallel_per_host: int = 2,
+    ):
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.parallel_per_host = parallel_per_host
+        self.hosts = [OllamaHost(host) for host in hosts]
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+        for host in self.hosts:
+            self._check(host)
+        if not any(host.healthy for host in self.hosts):
+            raise ValueError(f"No Ollama host serves {model_name}: {', '.join(hosts)}")
+
+    def _check(self, host: OllamaHost) -> None:
+        """Connect to a host and verify that it has the model"""
+        try:
+            if host.backend is None:
+                host.backend = OllamaBackend(host.host, self.model_name, self.keep_alive)
+            host.healthy = host.backend.is_available()
+            if not host.healthy:
+                print(f"Ollama host {host.host} doesn't serve {self.model_name}")
+        except Exception as e:
+            print(f"Ollama host {host.host} is unavailable: {e}")
+            host.healthy = False
+        if not host.healthy:
+            host.next_check = time.monotonic() + HEALTH_CHECK_INTERVAL_SECONDS
+
+    def _acquire(self, exclude: set[str]) -> OllamaHost:
+        with self._lock:
+            now = time.monotonic()
+            due = [
+                host
+                for host in self.hosts
+                if not host.healthy and host.next_check <= now and host.host not in exclude
+            ]
+            # Postpone the next check, so only one thread re-checks a host
+            for host in due:
+                host.next_check = now + HEALTH_CHECK_INTERVAL_SECONDS
+        for host in due:
+            self._check(host)
+
+        with self._lock:
+            candidates = [
+                host
+                for host in self.hosts
+                if host.healthy and host.host not in exclude
+            ]
+            if not candidates:
+                raise ConnectionError(f"No healthy Ollama host for {self.model_name}")
+            host = min(candidates, key=lambda h: (h.outstanding, h.completed))
+            host.outstanding += 1
+            return host
+
+    def _release(self, host: OllamaHost, start: float, failed: bool) -> None:
+        with self._lock:
+            host.outstanding -= 1
+            host.busy_seconds += time.perf_counter() - start
+            if failed:
+                host.failures += 1
+                host.healthy = False
+                host.next_check = time.monotonic() + HEALTH_CHECK_INTERVAL_SECONDS
+            else:
+                host.completed += 1
+
+    def is_available(self) -> bool:
+        return any(host.healthy for host in self.hosts)
+
+    def warm_up(self) -> None:
+        healthy = [host for host in self.hosts if host.healthy]
+        with ThreadPoolExecutor(max_workers=len(healthy)) as executor:
+            list(executor.map(lambda host: host.backend.warm_up(), healthy))
+
+    def generate(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        tried: set[str] = set()
+        while True:
+            host = self._acquire(tried)
+            start = time.perf_counter()
+            try:
+                response = host.backend.generate(prompt, images, format, options)
+            except Exception as e:
+                if not _is_host_error(e):
+                    self._release(host, start, failed=False)
+                    raise
+                self._release(host, start, failed=True)
+                tried.add(host.host)
+                print(f"Ollama host {host.host} failed, failing over: {e}")
+                continue
+            self._release(host, start, failed=False)
+            return response
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        images: Optional[List[List[str]]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        """Send the prompts to all hosts concurrently, results in prompt order"""
+        if not prompts:
+            return []
+        images = images or [[] for _ in prompts]
+        workers = self.parallel_per_host * len(self.hosts)
+        with ThreadPoolExecutor(max_workers=min(workers, len(prompts))) as executor:
+            return list(
+                executor.map(
+                    lambda job: self.generate(job[0], job[1], format, options),
+                    zip(prompts, images),
+                )
+            )
+
+    def generate_stream(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """Stream from one host; only a host failing before its first chunk is
+        failed over, since the caller has already consumed the output after that"""
+        tried: set[str] = set()
+        while True:
+            host = self._acquire(tried)
+            start = time.perf_counter()
+            started = False
+            stream = host.backend.generate_stream(prompt, images, format, options)
+            try:
+                for chunk in stream:
+                    started = True
+                    yield chunk
+            except GeneratorExit:
+                # Stopped early by the caller, which is not the host's fault
+                stream.close()
+                self._release(host, start, failed=False)
+                raise
+            except Exception as e:
+                host_error = _is_host_error(e)
+                self._release(host, start, failed=host_error)
+                if started or not host_error:
+                    raise
+                tried.add(host.host)
+                print(f"Ollama host {host.host} failed, failing over: {e}")
+                continue
+            self._release(host, start, failed=False)
+            return
+
+    def report(self) -> None:
+        """Print the requests, latency and share of the run's work of every host"""
+        elapsed = time.perf_counter() - self._started
+        total = sum(host.completed for host in self.hosts) or 1
+        for host in self.hosts:
+            latency = host.busy_seconds / host.completed if host.completed else 0
+            print(
+                f"{host.host}: {host.completed} requests ({host.completed / total:.0%}), "
+                f"{host.completed / elapsed * 60:.1f}/min, {latency:.2f}s each, "
+                f"{host.failures} failures"
+            )
+
+    def close(self) -> None:
+        self.report()
+        for host in self.hosts:
+            if host.backend is not None:
+                host.backend.close()
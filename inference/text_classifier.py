@@ -0,0 +1,66 @@
+import os
+import pickle
+from typing import Optional
+from models.apartment_models import ApartmentDetails
+
+
+def listing_text(apartment: ApartmentDetails) -> str:
+    """The text of a listing a criterion can be read from"""
+    return "\n".join([apartment.title, apartment.description, *apartment.features])
+
+
+class TextClassifier:
+    """Per-criterion TF-IDF + logistic regression models, distilled from LLM labels.
+
+    A criterion is only decided when the model's probability for one answer is
+    at least `threshold`; otherwise the classifier abstains and the LLM is asked.
+    """
+
+    def __init__(self, models: Optional[dict] = None, threshold: float = 0.9):
+        self.models = models or {}
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.9) -> Optional["TextClassifier"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return cls(pickle.load(f), threshold)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(self.models, f)
+        os.replace(f"{path}.tmp", path)
+
+    def fit(self, criterion: str, texts: list[str], labels: list[bool]) -> None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        # Character n-grams cope with German compounds (Geschirrspüler, Haustiere)
+        model = make_pipeline(
+            TfidfVectorizer(
+                analyzer="char_wb", ngram_range=(3, 5), min_df=2, sublinear_tf=True
+            ),
+            LogisticRegression(max_iter=1000, class_weight="balanced"),
+        )
+        model.fit(texts, labels)
+        self.models[criterion] = model
+
+    def predict_texts(self, texts: list[str]) -> list[dict[str, bool]]:
+        """Confident answers per text; abstained criteria are left out"""
+        decided: list[dict[str, bool]] = [{} for _ in texts]
+        if not texts:
+            return decided
+
+        for criterion, model in self.models.items():
+            classes = list(model.classes_)
+            for answers, probabilities in zip(decided, model.predict_proba(texts)):
+                best = probabilities.argmax()
+                if probabilities[best] >= self.threshold:
+                    answers[criterion] = bool(classes[best])
+        return decided
+
+    def predict(self, apartment: ApartmentDetails) -> dict[str, bool]:
+        return self.predict_texts([listing_text(apartment)])[0]
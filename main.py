@@ -1,18 +1,23 @@
+import argparse
 import os
-import pandas as pd
+import subprocess
+import sys
 from dotenv import load_dotenv
-from scrapers.flatfox_scraper import FlatfoxScraper
-from scrapers.immoscout24_scraper import ImmoScout24Scraper
-from tasks.detail_scraping import scrape_details
-from tasks.analyze_listings import analyze_listings
-from tasks.overview_scraping import scrape_overview
+
+# Heavy dependencies (pandas, Selenium, the inference backend) are imported inside
+# the commands that need them, so e.g. `main.py ui` never loads a browser driver.
 
 
 def load_existing_apartments():
     """Load existing apartments from CSV file if it exists"""
+    import pandas as pd
+
     try:
         if os.path.exists("output/apartments_basic.csv"):
-            df = pd.read_csv("output/apartments_basic.csv")
+            # The file is an append log, later rows of a URL supersede earlier ones
+            df = pd.read_csv(
+                "output/apartments_basic.csv", dtype=str, keep_default_na=False
+            ).drop_duplicates(subset="url", keep="last")
             existing_urls = set(df["url"])
             print(
                 f"Loaded {len(existing_urls)} existing apartment URLs from apartments_basic.csv"
@@ -24,28 +29,369 @@ def load_existing_apartments():
         return None, set()
 
 
-def main():
-    # Load environment variables
-    load_dotenv()
+def load_apartment_listings():
+    """Load the apartment listings of the last overview scraping run"""
+    from models.apartment_models import ApartmentListing
 
-    # Create output directory
-    os.makedirs("output", exist_ok=True)
+    existing_df, _ = load_existing_apartments()
+    if existing_df is None:
+        return []
+
+    return [
+        ApartmentListing(**{str(k): v for k, v in d.items()})
+        for d in existing_df.to_dict(orient="records")
+    ]
+
+
+def load_apartment_details():
+    """Load the apartment details of the last detail scraping run"""
+    from models.compact_models import compact_detail_list_adapter
+
+    if not os.path.exists("output/apartments_details.json"):
+        return []
+
+    with open("output/apartments_details.json", "r", encoding="utf-8") as f:
+        return compact_detail_list_adapter.validate_json(f.read())
+
+
+def create_page_archive():
+    import config
+    from storage.page_archive import PageArchive
+
+    if not config.ARCHIVE_PAGES:
+        return None
+
+    return PageArchive(
+        config.PAGE_ARCHIVE_DIR, compression_level=config.PAGE_ARCHIVE_COMPRESSION_LEVEL
+    )
+
+
+def create_journal():
+    import config
+    from storage.run_journal import RunJournal
+
+    return RunJournal(config.RUN_JOURNAL_FILE)
+
+
+def create_job_queue():
+    import config
+    from storage.job_queue import SqliteJobQueue
+
+    return SqliteJobQueue(config.JOB_QUEUE_FILE, max_attempts=config.JOB_MAX_ATTEMPTS)
+
+
+def create_scrapers(existing_urls: set[str], archive=None):
+    from scrapers.flatfox_scraper import FlatfoxScraper
+    from scrapers.immoscout24_scraper import ImmoScout24Scraper
+
+    return [
+        FlatfoxScraper(existing_urls=existing_urls, archive=archive),
+        ImmoScout24Scraper(existing_urls=existing_urls, archive=archive),
+    ]
+
+
+def close_scrapers(scrapers, archive=None) -> None:
+    for scraper in scrapers:
+        scraper.close()
+
+    if archive is not None:
+        archive.report()
+        archive.close()
+
+
+def run_all(args: argparse.Namespace) -> None:
+    """Scrape overview and details, then analyze the listings"""
+    from image_analyzer import ImageAnalyzer
+    from tasks.analyze_listings import analyze_listings
+    from tasks.detail_scraping import scrape_details
+    from tasks.overview_scraping import scrape_overview
 
     existing_df, existing_urls = load_existing_apartments()
+    journal = create_journal()
 
-    flatfox_scraper = FlatfoxScraper(existing_urls=existing_urls)
-    immoscout_scraper = ImmoScout24Scraper(existing_urls=existing_urls)
+    # Load the model up front so it stays resident through the scraping stages
+    print("Initializing image analyzer...")
+    image_analyzer = ImageAnalyzer(journal=journal)
+    image_analyzer.warm_up()
+
+    archive = create_page_archive()
+    scrapers = create_scrapers(existing_urls, archive)
 
     try:
-        apartments = scrape_overview([flatfox_scraper, immoscout_scraper], existing_df)
+        apartments, changed_urls = scrape_overview(scrapers, existing_df, journal)
         apartment_details = scrape_details(
-            [flatfox_scraper, immoscout_scraper], apartments
+            scrapers, apartments, journal, refresh_urls=changed_urls
         )
-        analyze_listings(apartment_details)
+        analyze_listings(apartment_details, image_analyzer, journal)
 
     finally:
         # Clean up
-        flatfox_scraper.close()
+        close_scrapers(scrapers, archive)
+        image_analyzer.close()
+        journal.close()
+
+
+def run_scrape_overview(args: argparse.Namespace) -> None:
+    from tasks.overview_scraping import scrape_overview
+
+    existing_df, existing_urls = load_existing_apartments()
+    journal = create_journal()
+    archive = create_page_archive()
+    scrapers = create_scrapers(existing_urls, archive)
+
+    try:
+        scrape_overview(scrapers, existing_df, journal)
+    finally:
+        close_scrapers(scrapers, archive)
+        journal.close()
+
+
+def run_scrape_details(args: argparse.Namespace) -> None:
+    from tasks.detail_scraping import scrape_details
+
+    apartments = load_apartment_listings()
+    journal = create_journal()
+    archive = create_page_archive()
+    scrapers = create_scrapers(set(), archive)
+
+    try:
+        scrape_details(scrapers, apartments, journal)
+    finally:
+        close_scrapers(scrapers, archive)
+        journal.close()
+
+
+def run_analyze(args: argparse.Namespace) -> None:
+    from image_analyzer import ImageAnalyzer
+    from tasks.analyze_listings import analyze_listings
+
+    journal = create_journal()
+    image_analyzer = ImageAnalyzer(journal=journal)
+    image_analyzer.warm_up()
+
+    try:
+        analyze_listings(load_apartment_details(), image_analyzer, journal)
+    finally:
+        image_analyzer.close()
+        journal.close()
+
+
+def run_watch(args: argparse.Namespace) -> None:
+    from image_analyzer import ImageAnalyzer
+    from tasks.watch import watch
+
+    _, existing_urls = load_existing_apartments()
+    journal = create_journal()
+
+    image_analyzer = ImageAnalyzer(journal=journal)
+    image_analyzer.warm_up()
+
+    archive = create_page_archive()
+    scrapers = create_scrapers(existing_urls, archive)
+
+    try:
+        watch(scrapers, existing_urls, image_analyzer, journal)
+    finally:
+        close_scrapers(scrapers, archive)
+        image_analyzer.close()
+        journal.close()
+
+
+def run_reparse(args: argparse.Namespace) -> None:
+    import config
+    from storage.page_archive import PageArchive
+    from tasks.reparse_pages import reparse_details
+
+    archive = PageArchive(config.PAGE_ARCHIVE_DIR)
+    try:
+        reparse_details(archive, load_apartment_listings(), workers=args.workers)
+    finally:
+        archive.close()
+
+
+def run_train_classifiers(args: argparse.Namespace) -> None:
+    from tasks.train_text_classifiers import train_text_classifiers
+
+    journal = create_journal()
+    try:
+        train_text_classifiers(journal)
+    finally:
+        journal.close()
+
+
+def run_enqueue_overview(args: argparse.Namespace) -> None:
+    from tasks.stage_workers import enqueue_overview
+
+    queue = create_job_queue()
+    try:
+        enqueue_overview(queue)
+    finally:
+        queue.close()
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """Work one stage of the pipeline, only starting what that stage needs"""
+    from tasks import stage_workers
+
+    queue = create_job_queue()
+    journal = create_journal()
+    scrapers, archive, image_analyzer = [], None, None
+    on_idle = None
+
+    try:
+        if args.stage in ("overview", "details"):
+            _, existing_urls = load_existing_apartments()
+            archive = create_page_archive()
+            scrapers = create_scrapers(existing_urls, archive)
+
+        if args.stage == "overview":
+
+            def handle(job):
+                # Other workers' runs added listings since the last job
+                existing_df, existing_urls = load_existing_apartments()
+                for scraper in scrapers:
+                    scraper.existing_urls = existing_urls
+                stage_workers.overview_job(job, queue, scrapers, existing_df, journal)
+
+        elif args.stage == "details":
+
+            def handle(job):
+                stage_workers.details_job(job, queue, scrapers, journal)
+
+        else:
+            from image_analyzer import ImageAnalyzer
+
+            image_analyzer = ImageAnalyzer(journal=journal)
+            # Fetching images needs no model
+            if args.stage != "images":
+                image_analyzer.warm_up()
+            stage_job = {
+                "images": stage_workers.images_job,
+                "vision": stage_workers.vision_job,
+                "criteria": stage_workers.criteria_job,
+            }[args.stage]
+
+            def handle(job):
+                stage_job(job, queue, journal, image_analyzer)
+
+            if args.stage == "criteria":
+
+                def on_idle():
+                    stage_workers.export_results(journal, image_analyzer)
+
+        stage_workers.work(
+            queue,
+            args.stage,
+            handle,
+            on_idle=on_idle,
+            exit_when_idle=args.exit_when_idle,
+        )
+    finally:
+        close_scrapers(scrapers, archive)
+        if image_analyzer is not None:
+            image_analyzer.close()
+        journal.close()
+        queue.close()
+
+
+def run_queue_status(args: argparse.Namespace) -> None:
+    from typing import get_args
+
+    from models.job_queue import JobStage
+
+    queue = create_job_queue()
+    try:
+        counts = queue.counts()
+    finally:
+        queue.close()
+
+    for stage in get_args(JobStage):
+        statuses = counts.get(stage, {})
+        print(
+            f"{stage:>9}: "
+            + ", ".join(
+                f"{statuses.get(status, 0)} {status}"
+                for status in ("pending", "leased", "done", "failed")
+            )
+        )
+
+
+def run_ui(args: argparse.Namespace) -> None:
+    ui_path = os.path.join(os.path.dirname(__file__), "ui", "apartment_browser.py")
+    subprocess.run([sys.executable, "-m", "streamlit", "run", ui_path], check=False)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Swiss apartment analyzer")
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Forget the run journal and redo every stage",
+    )
+    parser.set_defaults(func=run_all)
+    subparsers = parser.add_subparsers(title="commands")
+
+    subparsers.add_parser(
+        "scrape-overview", help="Scrape the search result pages"
+    ).set_defaults(func=run_scrape_overview)
+    subparsers.add_parser(
+        "scrape-details", help="Scrape the detail pages of known listings"
+    ).set_defaults(func=run_scrape_details)
+    subparsers.add_parser(
+        "analyze", help="Analyze the scraped apartment details"
+    ).set_defaults(func=run_analyze)
+    subparsers.add_parser(
+        "watch", help="Keep polling the searches and process new listings"
+    ).set_defaults(func=run_watch)
+    reparse_parser = subparsers.add_parser(
+        "reparse", help="Parse the archived detail pages again, without a browser"
+    )
+    reparse_parser.add_argument("--workers", type=int, default=None)
+    reparse_parser.set_defaults(func=run_reparse)
+    subparsers.add_parser(
+        "train-classifiers",
+        help="Train text classifiers for text-decidable criteria on the LLM answers",
+    ).set_defaults(func=run_train_classifiers)
+    subparsers.add_parser(
+        "enqueue-overview", help="Queue a scrape of the search profiles for the workers"
+    ).set_defaults(func=run_enqueue_overview)
+    worker_parser = subparsers.add_parser(
+        "worker", help="Work the queued jobs of one pipeline stage"
+    )
+    worker_parser.add_argument(
+        "stage", choices=["overview", "details", "images", "vision", "criteria"]
+    )
+    worker_parser.add_argument(
+        "--exit-when-idle",
+        action="store_true",
+        help="Stop once the stage has no jobs left, instead of polling",
+    )
+    worker_parser.set_defaults(func=run_worker)
+    subparsers.add_parser(
+        "queue-status", help="Show the number of jobs per stage and status"
+    ).set_defaults(func=run_queue_status)
+    subparsers.add_parser("ui", help="Start the apartment browser").set_defaults(
+        func=run_ui
+    )
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+
+    # Load environment variables
+    load_dotenv()
+
+    # Create output directory
+    os.makedirs("output", exist_ok=True)
+
+    if args.fresh:
+        journal = create_journal()
+        journal.clear()
+        journal.close()
+
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -35,6 +35,8 @@ class FilterResult(BaseModel):
 
     meets_all_criteria: bool
     criteria_results: Dict[str, bool]
+    # Who answered each criterion: "llm" or "text_classifier"
+    decided_by: Dict[str, str] = Field(default_factory=dict)
 
 
 class ApartmentAnalyzed(ApartmentDetails):
@@ -43,3 +45,4 @@ class ApartmentAnalyzed(ApartmentDetails):
 
 
 apartment_detail_list_adapter = TypeAdapter(list[ApartmentDetails])
+apartment_analyzed_list_adapter = TypeAdapter(list[ApartmentAnalyzed])
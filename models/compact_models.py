@@ -0,0 +1,122 @@
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from pydantic import TypeAdapter
+from models.apartment_models import ApartmentDetails, ApartmentListing
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+@dataclass(slots=True)
+class CompactListing:
+    """Slotted counterpart of ApartmentListing for holding many listings in memory.
+
+    Values that repeat across listings (prices, locations) are interned, so each
+    distinct string is stored once. Convert to the pydantic model with `to_model`
+    only where a single listing is actually worked on.
+    """
+
+    title: str
+    price: str
+    location: str
+    url: str
+
+    def __post_init__(self) -> None:
+        self.price = sys.intern(self.price)
+        self.location = sys.intern(self.location)
+
+    @classmethod
+    def from_model(cls, listing: ApartmentListing) -> "CompactListing":
+        return cls(listing.title, listing.price, listing.location, listing.url)
+
+    def to_model(self) -> ApartmentListing:
+        # Already validated when it was loaded, no need to validate again
+        return ApartmentListing.model_construct(
+            title=self.title, price=self.price, location=self.location, url=self.url
+        )
+
+
+@dataclass(slots=True)
+class CompactDetails(CompactListing):
+    """Slotted counterpart of ApartmentDetails, lists are stored as tuples"""
+
+    description: str
+    price_details: Optional[str] = None
+    street: Optional[str] = None
+    city: Optional[str] = None
+    area: Optional[float] = None
+    area_text: Optional[str] = None
+    available_from: Optional[str] = None
+    floor: Optional[int] = None
+    rooms: Optional[float] = None
+    features: Tuple[str, ...] = ()
+    description_features: Tuple[str, ...] = ()
+    property_details: Optional[Dict[str, str]] = field(default_factory=dict)
+    image_urls: Tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        # Zero-argument super() does not work in slotted dataclasses
+        CompactListing.__post_init__(self)
+        self.city = _intern(self.city)
+        self.area_text = _intern(self.area_text)
+        self.available_from = _intern(self.available_from)
+        self.features = tuple(sys.intern(f) for f in self.features)
+        if self.property_details:
+            self.property_details = {
+                sys.intern(k): sys.intern(v) for k, v in self.property_details.items()
+            }
+
+    @classmethod
+    def from_model(cls, details: ApartmentDetails) -> "CompactDetails":
+        return cls(
+            title=details.title,
+            price=details.price,
+            location=details.location,
+            url=details.url,
+            description=details.description,
+            price_details=details.price_details,
+            street=details.street,
+            city=details.city,
+            area=details.area,
+            area_text=details.area_text,
+            available_from=details.available_from,
+            floor=details.floor,
+            rooms=details.rooms,
+            features=tuple(details.features),
+            description_features=tuple(details.description_features),
+            property_details=details.property_details,
+            image_urls=tuple(details.image_urls),
+        )
+
+    def to_model(self) -> ApartmentDetails:
+        # Already validated when it was loaded, no need to validate again
+        return ApartmentDetails.model_construct(
+            title=self.title,
+            price=self.price,
+            location=self.location,
+            url=self.url,
+            description=self.description,
+            price_details=self.price_details,
+            street=self.street,
+            city=self.city,
+            area=self.area,
+            area_text=self.area_text,
+            available_from=self.available_from,
+            floor=self.floor,
+            rooms=self.rooms,
+            features=list(self.features),
+            description_features=list(self.description_features),
+            property_details=(
+                dict(self.property_details)
+                if self.property_details is not None
+                else None
+            ),
+            image_urls=list(self.image_urls),
+        )
+
+
+# Validates JSON straight into compact records, without building pydantic models
+compact_listing_list_adapter = TypeAdapter(list[CompactListing])
+compact_detail_list_adapter = TypeAdapter(list[CompactDetails])
@@ -0,0 +1,60 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class InferenceBackend(ABC):
+    """Abstract base class for the model servers behind the ImageAnalyzer."""
+
+    model_name: str
+
+    @abstractmethod
+    def warm_up(self) -> None:
+        """Load the model so the first real request doesn't pay for it"""
+        pass
+
+    def is_available(self) -> bool:
+        """Whether the model can serve requests, e.g. is pulled on the server"""
+        return True
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Generate a completion for a prompt and optional base64 encoded images"""
+        pass
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        images: Optional[List[List[str]]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        """Generate completions for many prompts, one request after another by default"""
+        images = images or [[] for _ in prompts]
+        return [
+            self.generate(prompt, imgs, format=format, options=options)
+            for prompt, imgs in zip(prompts, images)
+        ]
+
+    def generate_stream(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """Yield a completion piece by piece; closing the iterator stops generation.
+
+        Backends without streaming yield the whole completion at once.
+        """
+        yield self.generate(prompt, images, format=format, options=options)
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release the model and clean up resources"""
+        pass
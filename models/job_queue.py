@@ -0,0 +1,60 @@
+from abc import ABC, abstractmethod
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+# Stages of the pipeline, in order; each one is worked by its own workers
+JobStage = Literal["overview", "details", "images", "vision", "criteria"]
+
+
+class Job(BaseModel):
+    """A unit of work of one stage, e.g. the details of one listing"""
+
+    id: int
+    stage: JobStage
+    key: str
+    payload: Optional[str] = None
+    attempts: int = 0
+
+
+class JobQueue(ABC):
+    """Abstract base class for the queue the stage workers take their jobs from.
+
+    A leased job is invisible to other workers until its lease expires, so a job
+    of a worker that crashed or hung is handed out again.
+    """
+
+    @abstractmethod
+    def enqueue(self, stage: JobStage, key: str, payload: Optional[str] = None) -> None:
+        """Add a job; a job with the same key that is done or failed is redone"""
+        pass
+
+    @abstractmethod
+    def lease(
+        self, stage: JobStage, worker: str, visibility_timeout: float, limit: int = 1
+    ) -> list[Job]:
+        """Take up to `limit` jobs of a stage for `visibility_timeout` seconds"""
+        pass
+
+    @abstractmethod
+    def extend(self, job: Job, worker: str, visibility_timeout: float) -> bool:
+        """Renew the lease of a long-running job, False if it was lost meanwhile"""
+        pass
+
+    @abstractmethod
+    def complete(self, job: Job, worker: str) -> None:
+        pass
+
+    @abstractmethod
+    def fail(self, job: Job, worker: str, error: str) -> None:
+        """Release a job for another attempt, or give up after the last one"""
+        pass
+
+    @abstractmethod
+    def counts(self) -> dict[str, dict[str, int]]:
+        """Number of jobs per stage and status"""
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
@@ -1,14 +1,83 @@
 from abc import ABC, abstractmethod
-from typing import List, Set
+import logging
+from tqdm import tqdm
+from typing import Any, List, Optional, Set
 
+import config
 from models.apartment_models import ApartmentDetails, ApartmentListing
+from scrapers.browser_session import BrowserSessions
+from storage.page_archive import PageArchive, PageKind
 
 
 class Scraper(ABC):
     """Abstract base class for apartment listing scrapers."""
 
-    def __init__(self, existing_urls: Set[str]):
+    # Name of the portal, used for its browser profile and in the page archive
+    portal: str
+    # The browser session, started by setup_browser
+    driver: Any
+
+    def __init__(self, existing_urls: Set[str], archive: Optional[PageArchive] = None):
         self.existing_urls = existing_urls or set()
+        self.archive = archive
+        self.sessions = BrowserSessions(self.portal)
+
+    def archive_page(self, kind: PageKind, url: str, html: str) -> None:
+        """Store the raw page so it can be parsed again without the browser"""
+        if self.archive is not None:
+            self.archive.save(self.portal, kind, url, html)
+
+    def is_known_page(self, listings: List[ApartmentListing]) -> bool:
+        """Whether enough of a result page is already known to stop paging.
+
+        Only meaningful for searches sorted newest first.
+        """
+        if config.KNOWN_PAGE_STOP_RATIO is None or not listings:
+            return False
+
+        known = sum(listing.url in self.existing_urls for listing in listings)
+        return known / len(listings) >= config.KNOWN_PAGE_STOP_RATIO
+
+    def browser_responds(self) -> bool:
+        """Whether the page still runs scripts; a hung renderer times out"""
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def restart_browser(self, reason: str) -> None:
+        """Replace the browser session with a fresh one"""
+        self.sessions.end(reason)
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error closing the {self.portal} browser: {e}")
+        self.setup_browser()
+
+    def recycle_browser_if_due(self) -> None:
+        """Restart the browser once its session visited too many pages or grew
+        too large, see BROWSER_RECYCLE_PAGES and BROWSER_MAX_RSS_MB"""
+        reason = self.sessions.recycle_reason()
+        if reason is not None:
+            self.restart_browser(reason)
+
+    def fetch_details(self, apartment: ApartmentListing) -> ApartmentDetails:
+        """get_apartment_details in a browser session that is kept healthy.
+
+        A page that fails while the browser no longer responds is loaded again in
+        a fresh session, so the listing isn't lost to a hung renderer.
+        """
+        self.recycle_browser_if_due()
+        try:
+            details = self.get_apartment_details(apartment)
+        except Exception as e:
+            if self.browser_responds():
+                raise
+            self.restart_browser(f"hung on {apartment.url} ({type(e).__name__})")
+            details = self.get_apartment_details(apartment)
+        self.sessions.page_done(self.driver)
+        return details
 
     @abstractmethod
     def setup_browser(self) -> None:
@@ -16,8 +85,13 @@ class Scraper(ABC):
         pass
 
     @abstractmethod
-    def scrape_listings(self) -> List[ApartmentListing]:
-        """Scrape apartment listings and return a list of basic apartment data"""
+    def scrape_listings(
+        self, search_url: Optional[str] = None, max_pages: Optional[int] = None
+    ) -> List[ApartmentListing]:
+        """Scrape apartment listings of a search (the portal's default search if None)
+
+        `max_pages` defaults to config.MAX_PAGES_TO_SCRAPE.
+        """
         pass
 
     @abstractmethod
@@ -27,6 +101,21 @@ class Scraper(ABC):
         """Fetch detailed information about an apartment from its URL"""
         pass
 
+    def get_apartment_details_batch(
+        self, apartments: List[ApartmentListing]
+    ) -> List[Optional[ApartmentDetails]]:
+        """Fetch details for many apartments, one after another by default"""
+        results: List[Optional[ApartmentDetails]] = []
+        for apartment in tqdm(apartments):
+            try:
+                results.append(self.fetch_details(apartment))
+            except Exception as e:
+                logging.error(
+                    f"Error getting details for apartment {apartment.url}: {e}"
+                )
+                results.append(None)
+        return results
+
     @abstractmethod
     def is_scraped_by_me(self, apartment: ApartmentListing) -> bool:
         """Check if the apartment was scraped by this scraper"""
@@ -0,0 +1,134 @@
+import json
+import os
+import time
+import logging
+from selenium import webdriver
+from selenium.webdriver.edge.service import Service
+from selenium.webdriver.edge.options import Options
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+import config
+
+
+def _read_cached_driver_path() -> str | None:
+    try:
+        with open(config.DRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    max_age = config.DRIVER_CACHE_MAX_AGE_DAYS * 24 * 60 * 60
+    if time.time() - cached.get("resolved_at", 0) > max_age:
+        return None
+
+    path = cached.get("path")
+    if not path or not os.path.exists(path):
+        return None
+
+    return path
+
+
+def get_driver_path(refresh: bool = False) -> str:
+    """Resolve the Edge webdriver binary, reusing the last resolution when possible"""
+    if not refresh:
+        path = _read_cached_driver_path()
+        if path:
+            return path
+
+    path = EdgeChromiumDriverManager().install()
+
+    os.makedirs(os.path.dirname(config.DRIVER_CACHE_FILE) or ".", exist_ok=True)
+    with open(config.DRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"path": path, "resolved_at": time.time()}, f)
+
+    return path
+
+
+def create_edge_options() -> Options:
+    """Browser options shared by all scrapers"""
+    options = Options()
+    if config.HEADLESS_BROWSER:
+        options.add_argument("--headless")
+    options.add_argument("--lang=de-CH")
+    options.add_argument("--charset=UTF-8")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--enable-unsafe-swiftshader")
+    options.add_argument("--log-level=3")
+    options.add_argument("--disable-logging")
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    return options
+
+
+def add_profile_options(options: Options, profile_name: str) -> None:
+    """Use a persistent profile per portal so cookies and the HTTP cache survive runs"""
+    if not config.PERSISTENT_BROWSER_PROFILE:
+        return
+
+    profile_dir = os.path.abspath(
+        os.path.join(config.BROWSER_PROFILE_DIR, profile_name)
+    )
+    os.makedirs(profile_dir, exist_ok=True)
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument(f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}")
+    options.add_argument(f"--disk-cache-size={config.BROWSER_DISK_CACHE_SIZE}")
+
+
+def get_blocked_url_patterns(profile_name: str) -> list[str]:
+    """Combine the default and portal deny lists, minus the portal's allow list"""
+    allowed = set(config.ALLOWED_URL_PATTERNS.get(profile_name, []))
+    patterns = [
+        *config.BLOCKED_URL_PATTERNS.get("default", []),
+        *config.BLOCKED_URL_PATTERNS.get(profile_name, []),
+    ]
+    return [pattern for pattern in dict.fromkeys(patterns) if pattern not in allowed]
+
+
+def block_resources(driver: webdriver.Edge, profile_name: str) -> None:
+    """Stop the browser from downloading images, fonts and trackers"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd(
+        "Network.setBlockedURLs", {"urls": get_blocked_url_patterns(profile_name)}
+    )
+
+
+def measure_page_load(driver: webdriver.Edge) -> tuple[float, int]:
+    """Return the load time (ms) and transferred bytes of the current page"""
+    return driver.execute_script(
+        """
+        const nav = performance.getEntriesByType("navigation")[0];
+        const resources = performance.getEntriesByType("resource");
+        const transferred = resources.reduce((sum, r) => sum + r.transferSize, 0);
+        return [
+            nav ? nav.loadEventEnd - nav.startTime : 0,
+            transferred + (nav ? nav.transferSize : 0),
+        ];
+        """
+    )
+
+
+def create_edge_driver(
+    options: Options, profile_name: str, block: bool | None = None
+) -> webdriver.Edge:
+    """Start Edge with the cached driver binary and the portal's browser profile"""
+    add_profile_options(options, profile_name)
+
+    try:
+        driver = webdriver.Edge(service=Service(get_driver_path()), options=options)
+    except Exception as e:
+        # The cached driver may no longer match the installed browser
+        logging.warning(f"Starting Edge with cached driver failed, re-resolving: {e}")
+        driver = webdriver.Edge(
+            service=Service(get_driver_path(refresh=True)), options=options
+        )
+
+    # A hung renderer then raises instead of stalling the scraper indefinitely
+    driver.set_page_load_timeout(config.BROWSER_PAGE_LOAD_TIMEOUT_SECONDS)
+    driver.set_script_timeout(config.BROWSER_SCRIPT_TIMEOUT_SECONDS)
+
+    if config.BLOCK_RESOURCES if block is None else block:
+        block_resources(driver, profile_name)
+
+    return driver
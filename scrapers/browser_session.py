@@ -0,0 +1,135 @@
+import csv
+import itertools
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+import psutil
+
+import config
+
+# Sessions of all scrapers are numbered together, so the memory log is unambiguous
+_session_ids = itertools.count(1)
+_log_lock = threading.Lock()
+
+
+def browser_rss(driver: Any) -> int:
+    """Resident memory (bytes) of the browser behind a driver, all its processes.
+
+    Edge runs as children of the webdriver process; 0 if it can't be measured.
+    """
+    try:
+        driver_process = psutil.Process(driver.service.process.pid)
+        processes = [driver_process, *driver_process.children(recursive=True)]
+    except (AttributeError, psutil.Error):
+        return 0
+
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except psutil.Error:
+            # Renderers come and go between listing and measuring them
+            continue
+    return rss
+
+
+class SessionStats:
+    def __init__(self, driver: Any):
+        self.id = next(_session_ids)
+        self.driver = driver
+        self.started = time.monotonic()
+        self.pages = 0
+        self.first_rss = 0
+        self.rss = 0
+        self.peak_rss = 0
+        self.end_reason: Optional[str] = None
+
+
+class BrowserSessions:
+    """Tracks the browser sessions of one scraper and decides when to recycle.
+
+    A session is due for recycling after BROWSER_RECYCLE_PAGES pages or once its
+    memory passes BROWSER_MAX_RSS_MB. The memory is sampled after every page and
+    appended to BROWSER_MEMORY_LOG.
+    """
+
+    def __init__(self, portal: str):
+        self.portal = portal
+        self.sessions: list[SessionStats] = []
+
+    @property
+    def current(self) -> Optional[SessionStats]:
+        return self.sessions[-1] if self.sessions else None
+
+    def page_done(self, driver: Any) -> None:
+        # A new driver means the scraper started a new session
+        if self.current is None or self.current.driver is not driver:
+            self.sessions.append(SessionStats(driver))
+        session = self.current
+        session.pages += 1
+        session.rss = browser_rss(driver)
+        session.peak_rss = max(session.peak_rss, session.rss)
+        if session.pages == 1:
+            session.first_rss = session.rss
+        self._log(session)
+
+    def recycle_reason(self) -> Optional[str]:
+        session = self.current
+        if session is None or session.end_reason is not None:
+            return None
+        recycle_pages = config.BROWSER_RECYCLE_PAGES
+        if recycle_pages and session.pages >= recycle_pages:
+            return f"{session.pages} pages visited"
+        if (
+            config.BROWSER_MAX_RSS_MB
+            and session.rss > config.BROWSER_MAX_RSS_MB * 1024 * 1024
+        ):
+            return f"memory at {session.rss / 1024 / 1024:.0f} MB"
+        return None
+
+    def end(self, reason: str) -> None:
+        session = self.current
+        if session is None or session.end_reason is not None:
+            return
+        session.end_reason = reason
+        print(f"{self.portal} browser session {session.id} ended: {reason}")
+
+    def report(self) -> None:
+        """Print the pages and memory growth of every session"""
+        for session in self.sessions:
+            minutes = (time.monotonic() - session.started) / 60
+            print(
+                f"{self.portal} browser session {session.id}: {session.pages} pages "
+                f"in {minutes:.1f} min, memory {session.first_rss / 1024 / 1024:.0f}"
+                f" -> {session.rss / 1024 / 1024:.0f} MB "
+                f"(peak {session.peak_rss / 1024 / 1024:.0f} MB), "
+                f"ended by {session.end_reason or 'close'}"
+            )
+
+    def _log(self, session: SessionStats) -> None:
+        if not config.BROWSER_MEMORY_LOG:
+            return
+        try:
+            with _log_lock:
+                write_header = not os.path.exists(config.BROWSER_MEMORY_LOG)
+                with open(
+                    config.BROWSER_MEMORY_LOG, "a", newline="", encoding="utf-8"
+                ) as f:
+                    writer = csv.writer(f)
+                    if write_header:
+                        writer.writerow(["time", "portal", "session", "pages", "rss_mb"])
+                    writer.writerow(
+                        [
+                            datetime.now().isoformat(),
+                            self.portal,
+                            session.id,
+                            session.pages,
+                            round(session.rss / 1024 / 1024, 1),
+                        ]
+                    )
+        except OSError as e:
+            logging.warning(f"Error writing the browser memory log: {e}")
@@ -0,0 +1,217 @@
+"""Pure functions that turn archived flatfox.ch pages into apartment models"""
+
+from typing import Any, Dict, List
+import logging
+from selectolax.parser import HTMLParser
+from models.apartment_models import ApartmentListing, ApartmentDetails
+from scrapers.parsing import absolute_url, css_text, node_text, parse_html
+
+
+def parse_listings(html: str, page_url: str) -> List[ApartmentListing]:
+    """Extract all listing cards of a search result page"""
+    tree = parse_html(html)
+    apartments: List[ApartmentListing] = []
+
+    for card in tree.css(".listing-thumb"):
+        try:
+            # Get link element and URL
+            link_element = card.css_first("a.listing-thumb__image")
+            url = absolute_url(
+                page_url, link_element.attributes.get("href") if link_element else None
+            )
+
+            if url is None:
+                logging.error("No URL found for this listing")
+                continue
+
+            # Title is in h2 inside listing-thumb-title
+            title = css_text(card, "h2").split("\n")[0]
+
+            # Location is in a span with class listing-thumb-title__location
+            location = css_text(card, "span.listing-thumb-title__location")
+
+            # Contains "1'387 CHF" or "1'900 CHF / m²"
+            price_info = css_text(card, ".attributes div div")
+
+            apartments.append(
+                ApartmentListing(
+                    title=title,
+                    price=price_info,
+                    location=location,
+                    url=url,
+                )
+            )
+        except Exception as e:
+            print(f"Error parsing apartment card: {e}")
+
+    return apartments
+
+
+def parse_details(html: str, apartment: ApartmentListing) -> ApartmentDetails:
+    """Extract detailed information about an apartment from its detail page"""
+    tree = parse_html(html)
+    details = apartment.model_dump()
+
+    _parse_title(tree, details)
+    _parse_description(tree, details)
+    _parse_property_details(tree, details)
+    details["image_urls"] = _parse_image_urls(tree, apartment.url)
+    details.setdefault("description", "")
+
+    return ApartmentDetails(**details)
+
+
+def _parse_title(tree: HTMLParser, details: Dict[str, Any]) -> None:
+    widget_title = tree.css_first(".widget-listing-title")
+    if widget_title is None:
+        # Fall back to the old structure
+        old_title = tree.css_first("h1.PropertyDetailPage-title")
+        if old_title is not None:
+            details["title"] = node_text(old_title)
+        return
+
+    try:
+        # Extract main title from h1
+        details["title"] = css_text(widget_title, "h1")
+
+        # Parse subtitle (format: "Street, Postal Code City - Price")
+        subtitle = css_text(widget_title, "h2")
+        if " - " in subtitle:
+            location_part, price_part = subtitle.split(" - ", 1)
+
+            # Extract location
+            if "," in location_part:
+                street, city_info = location_part.split(",", 1)
+                details["street"] = street.strip()
+                details["city"] = city_info.strip()
+            else:
+                details["location"] = location_part.strip()
+
+            # Extract price
+            details["price_details"] = price_part.strip()
+    except Exception as e:
+        print(f"Error extracting from new title structure: {e}")
+
+
+def _parse_description(tree: HTMLParser, details: Dict[str, Any]) -> None:
+    description_section = next(
+        (
+            heading.parent
+            for heading in tree.css("div > h2")
+            if "Beschreibung" in node_text(heading)
+        ),
+        None,
+    )
+    if description_section is None:
+        details["description"] = ""
+        return
+
+    # The heading is in a strong tag, the main content is rendered markdown
+    description_heading = css_text(description_section, "strong.user-generated-content")
+    description_content = css_text(description_section, "div.markdown")
+
+    # Combine heading and content
+    full_description = ""
+    if description_heading:
+        full_description = f"{description_heading}\n\n"
+    if description_content:
+        full_description += description_content
+
+    if not full_description:
+        return
+
+    details["description"] = full_description
+
+    # Extract features from description bullet points
+    # Look for lines starting with "-" or "•"
+    description_features = []
+    for line in description_content.split("\n"):
+        line = line.strip()
+        if line.startswith("-") or line.startswith("•"):
+            # Remove the bullet and trim
+            feature = line[1:].strip()
+            if feature:
+                description_features.append(feature)
+
+    if description_features:
+        features = details.setdefault("features", [])
+
+        # Add features from description if not already in the list
+        for feature in description_features:
+            if feature not in features:
+                features.append(feature)
+
+        # Also store them separately if needed
+        details["description_features"] = description_features
+
+
+def _parse_property_details(tree: HTMLParser, details: Dict[str, Any]) -> None:
+    property_details: dict[str, str] = {}
+    for row in tree.css("table.table--rows tr"):
+        # Each row has two cells: key and value
+        cells = row.css("td")
+        if len(cells) == 2:
+            key = node_text(cells[0]).rstrip(":")
+            value = node_text(cells[1])
+            if key and value:
+                # Clean up the key to make it usable as a dictionary key
+                key_cleaned = key.lower().replace(" ", "_").replace(":", "")
+                property_details[key_cleaned] = value
+
+    if not property_details:
+        return
+
+    details["property_details"] = property_details
+
+    # Extract some common fields to the top level for easier access
+    if "nutzfläche" in property_details:
+        area_text = property_details["nutzfläche"]
+        # Try to extract numeric area value (e.g., "99 m²" -> 99)
+        try:
+            area_value = area_text.split()[0].replace(",", ".")
+            details["area"] = float(area_value)
+        except (IndexError, ValueError):
+            details["area_text"] = area_text
+
+    if "bezugstermin" in property_details:
+        details["available_from"] = property_details["bezugstermin"]
+
+    if "ausstattung" in property_details:
+        # Split features by comma if they're combined
+        features_text = property_details["ausstattung"]
+        details.setdefault("features", []).extend(
+            f.strip() for f in features_text.split(",")
+        )
+
+    if "etage" in property_details:
+        floor_str = property_details["etage"].replace(". Etage", "").lower()
+        if "erdgeschoss" in floor_str or "parterre" in floor_str:
+            details["floor"] = 0
+        else:
+            try:
+                details["floor"] = int(floor_str)
+            except ValueError:
+                print(f"Error parsing floor: {property_details['etage']}")
+
+
+def _parse_image_urls(tree: HTMLParser, page_url: str) -> List[str]:
+    image_urls = []
+
+    # Try the new gallery structure first
+    figure_elements = tree.css(".flat-detail-gallery figure")
+    if figure_elements:
+        for fig in figure_elements:
+            link_element = fig.css_first("a")
+            img_url = absolute_url(
+                page_url, link_element.attributes.get("href") if link_element else None
+            )
+            if img_url and not img_url.endswith("placeholder.jpg"):
+                image_urls.append(img_url)
+    else:
+        # Fall back to the old structure
+        for img in tree.css(".PropertyGallery img"):
+            img_url = absolute_url(page_url, img.attributes.get("src"))
+            if img_url and not img_url.endswith("placeholder.jpg"):
+                image_urls.append(img_url)
+
+    return image_urls
@@ -1,55 +1,51 @@
-from typing import List, Dict, Any, Set
+from typing import List, Optional, Set
 import time
 import logging
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from selenium.webdriver.remote.webelement import WebElement
 import config
-from tqdm import tqdm
 from models.scraper import Scraper
+from scrapers import flatfox_parser
+from scrapers.browser import create_edge_driver, create_edge_options
+from scrapers.http_fetcher import HttpFetcher
+from storage.page_archive import PageArchive
 from models.apartment_models import ApartmentListing, ApartmentDetails
 
+# Query parameter sorting the search results by date, newest first
+NEWEST_FIRST_PARAM = "ordering=date"
+
 
 class FlatfoxScraper(Scraper):
-    def __init__(self, existing_urls: Set[str]):
-        super().__init__(existing_urls)
+    portal = "flatfox"
+
+    def __init__(
+        self,
+        existing_urls: Set[str],
+        block_resources: bool | None = None,
+        archive: Optional[PageArchive] = None,
+    ):
+        super().__init__(existing_urls, archive)
+        self.block_resources = block_resources
         self.setup_browser()
 
     def setup_browser(self) -> None:
         """Initialize the browser for scraping"""
-        options = Options()
-        if config.HEADLESS_BROWSER:  # Access as config.VARIABLE
-            options.add_argument("--headless")
-        options.add_argument("--lang=de-CH")
-        options.add_argument("--charset=UTF-8")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--enable-unsafe-swiftshader")
-        options.add_argument("--log-level=3")
-        options.add_argument("--disable-logging")
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])
-
-        self.driver = webdriver.Edge(
-            service=Service(EdgeChromiumDriverManager().install()), options=options
+        self.driver = create_edge_driver(
+            create_edge_options(),
+            profile_name=self.portal,
+            block=self.block_resources,
         )
 
-    def scrape_listings(self) -> List[ApartmentListing]:
+    def scrape_listings(
+        self, search_url: Optional[str] = None, max_pages: Optional[int] = None
+    ) -> List[ApartmentListing]:
         """Scrape apartment listings from flatfox.ch"""
         print("Starting to scrape Flatfox listings...")
-        self.driver.get(config.FLATFOX_URL)  # Access as config.VARIABLE
-
-        new_listings_count = 0
-        existing_count = len(self.existing_urls)
-        if existing_count > 0:
-            print(f"Will skip {existing_count} already scraped listings")
+        search_url = search_url or config.FLATFOX_URL  # Access as config.VARIABLE
+        newest_first = NEWEST_FIRST_PARAM in search_url
+        self.driver.get(search_url)
 
         # Wait for the page to load
         WebDriverWait(self.driver, 10).until(
@@ -62,22 +58,36 @@ class FlatfoxScraper(Scraper):
             # Cookie button might not appear if cookies are already accepted
             pass
 
-        apartments: List[ApartmentListing] = []
         pages_loaded: int = 1
+        max_pages = max_pages or config.MAX_PAGES_TO_SCRAPE
+        previous_count: int = 0
 
         # Continue loading more pages until reaching the maximum or no more results
-        while pages_loaded <= config.MAX_PAGES_TO_SCRAPE:
+        while pages_loaded <= max_pages:
             # Extract property cards on the current page
             property_cards: List[WebElement] = self.driver.find_elements(
                 By.CLASS_NAME, "listing-thumb"
             )
 
-            # Process current cards
-
             print(
                 f"Loaded page {pages_loaded} - found {len(property_cards)} listings so far"
             )
 
+            # "Show more" appends to the list, so the last page is everything after
+            # the cards we had before
+            page_listings = flatfox_parser.parse_listings(
+                self.driver.page_source, self.driver.current_url
+            )[previous_count:]
+            previous_count += len(page_listings)
+            self.sessions.page_done(self.driver)
+            # Only sorted newest first is everything after a known page known too
+            if newest_first and self.is_known_page(page_listings):
+                print("Reached already known listings, stopping")
+                break
+
+            if pages_loaded >= max_pages:
+                break
+
             # Try to click "Show more" button to load more results
             try:
                 # Find the "Mehr anzeigen" (Show more) button
@@ -113,66 +123,16 @@ class FlatfoxScraper(Scraper):
                 print(f"No more results to load or reached the end")
                 break
 
-        # After loading all pages, collect all listings
-        all_property_cards = self.driver.find_elements(By.CLASS_NAME, "listing-thumb")
-        print(f"Total listings found: {len(all_property_cards)}")
-
-        # Process all cards to extract data
-        for card in tqdm(all_property_cards):
-            try:
-                # Get link element and URL
-                link_element = card.find_element(
-                    By.CSS_SELECTOR, "a.listing-thumb__image"
-                )
-                url = link_element.get_attribute("href")
-
-                if url is None:
-                    logging.error("No URL found for this listing")
-                    continue
-
-                # Skip if already in our database
-                if url in self.existing_urls:
-                    continue
-
-                new_listings_count += 1
-
-                # Extract basic info from the card
-                # Title is in h2 inside listing-thumb-title
-                title_element = card.find_element(By.CSS_SELECTOR, "h2")
-                title = (
-                    title_element.text.split("\n")[0]
-                    if "\n" in title_element.text
-                    else title_element.text
-                )
-
-                # Location is in a span with class listing-thumb-title__location
-                location = card.find_element(
-                    By.CSS_SELECTOR, "span.listing-thumb-title__location"
-                ).text
-
-                # Get currency and additional price info
-                price_container = card.find_element(
-                    By.CSS_SELECTOR, ".attributes div div"
-                )
-                price_info = (
-                    price_container.text
-                )  # Contains "1'387 CHF" or "1'900 CHF / m²"
-
-                apartment = ApartmentListing(
-                    title=title,
-                    price=price_info,
-                    location=location,
-                    url=url,
-                )
-
-                apartments.append(apartment)
-            except Exception as e:
-                print(f"Error scraping apartment card: {e}")
-
+        # After loading all pages, parse all listings from the page source
+        html = self.driver.page_source
+        self.archive_page("overview", self.driver.current_url, html)
+        all_listings = flatfox_parser.parse_listings(html, self.driver.current_url)
+        # Known listings are returned too, the overview merge detects changed ones
+        known_count = sum(apt.url in self.existing_urls for apt in all_listings)
         print(
-            f"Found {new_listings_count} new apartments (skipped {len(all_property_cards) - new_listings_count} existing)"
+            f"Total listings found: {len(all_listings)} ({known_count} already known)"
         )
-        return apartments
+        return all_listings
 
     def get_apartment_details(self, apartment: ApartmentListing) -> ApartmentDetails:
         """Fetch detailed information about an apartment"""
@@ -189,221 +149,58 @@ class FlatfoxScraper(Scraper):
             # Cookie button might not appear if cookies are already accepted
             pass
 
-        # Extract detailed information
-        details = apartment.model_dump()
+        html = self.driver.page_source
+        self.archive_page("detail", apartment.url, html)
 
-        # Try the new title structure first, then fall back to the old one
-        try:
-            widget_title = self.driver.find_element(
-                By.CSS_SELECTOR, ".widget-listing-title"
-            )
-            if widget_title:
-                # Extract main title from h1
-                main_title = widget_title.find_element(
-                    By.CSS_SELECTOR, "h1"
-                ).text.strip()
-                details["title"] = main_title
-
-                # Extract location and price from h2
-                subtitle = widget_title.find_element(By.CSS_SELECTOR, "h2").text.strip()
-
-                # Parse subtitle (format: "Street, Postal Code City - Price")
-                if "-" in subtitle:
-                    location_part, price_part = subtitle.split(" - ", 1)
-
-                    # Extract location
-                    if "," in location_part:
-                        street, city_info = location_part.split(",", 1)
-                        details["street"] = street.strip()
-                        details["city"] = city_info.strip()
-                    else:
-                        details["location"] = location_part.strip()
-
-                    # Extract price
-                    details["price_details"] = price_part.strip()
-        except Exception as e:
-            print(f"Error extracting from new title structure: {e}")
+        return flatfox_parser.parse_details(html, apartment)
 
-        # Fall back to the old structure if needed
-        if "title" not in details:
-            try:
-                details["title"] = self.driver.find_element(
-                    By.CSS_SELECTOR, "h1.PropertyDetailPage-title"
-                ).text
-            except Exception as e:
-                print(f"Error extracting title from old structure: {e}")
-                details["title"] = ""
+    def get_apartment_details_batch(
+        self, apartments: List[ApartmentListing]
+    ) -> List[Optional[ApartmentDetails]]:
+        """Fetch the server-rendered detail pages over HTTP instead of the browser"""
+        if not config.HTTP_DETAIL_FETCH:
+            return super().get_apartment_details_batch(apartments)
 
-        # Description - Try the new structure first
+        fetcher = HttpFetcher(
+            load_cached_body=self.archive.latest_body if self.archive else None
+        )
         try:
-            description_section = self.driver.find_element(
-                By.XPATH, "//div/h2[contains(text(), 'Beschreibung')]/.."
+            fetch_results = fetcher.fetch_all(
+                [apartment.url for apartment in apartments]
             )
-            if description_section:
-                # Try to get the heading (in strong tag)
-                description_heading = ""
-                try:
-                    heading_element = description_section.find_element(
-                        By.CSS_SELECTOR, "strong.user-generated-content"
-                    )
-                    description_heading = heading_element.text.strip()
-                except Exception:
-                    pass  # No heading found
-
-                # Get the main description content
-                description_content = ""
-                try:
-                    content_element = description_section.find_element(
-                        By.CSS_SELECTOR, "div.markdown"
-                    )
-                    description_content = content_element.text.strip()
-                except Exception as e:
-                    print(f"Error extracting markdown content: {e}")
-
-                # Combine heading and content
-                full_description = ""
-                if description_heading:
-                    full_description = f"{description_heading}\n\n"
-                if description_content:
-                    full_description += description_content
-
-                if full_description:
-                    details["description"] = full_description
-
-                    # Extract features from description bullet points
-                    # Look for lines starting with "-" or "•"
-                    description_features = []
-                    for line in description_content.split("\n"):
-                        line = line.strip()
-                        if line.startswith("-") or line.startswith("•"):
-                            # Remove the bullet and trim
-                            feature = line[1:].strip()
-                            if feature:
-                                description_features.append(feature)
-
-                    # Add these features to the features list
-                    if description_features:
-                        if "features" not in details:
-                            details["features"] = []
-
-                        # Add features from description if not already in the list
-                        for feature in description_features:
-                            if feature not in details["features"]:
-                                details["features"].append(feature)
-
-                        # Also store them separately if needed
-                        details["description_features"] = description_features
-        except Exception as e:
-            print(f"Error extracting from new description structure: {e}")
-            details["description"] = ""
-
-        # Extract property details from table
-        property_details: dict[str, str] = {}
-        try:
-            # Look for the details table
-            tables = self.driver.find_elements(By.CSS_SELECTOR, "table.table--rows")
-            for table in tables:
-                # Check if this is the details table
-                try:
-                    # Get all rows in the table
-                    rows = table.find_elements(By.TAG_NAME, "tr")
-                    for row in rows:
-                        # Each row has two cells: key and value
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        if len(cells) == 2:
-                            key = cells[0].text.strip().rstrip(":")
-                            value = cells[1].text.strip()
-                            if key and value:
-                                # Clean up the key to make it usable as a dictionary key
-                                key_cleaned = (
-                                    key.lower().replace(" ", "_").replace(":", "")
-                                )
-                                property_details[key_cleaned] = value
-                except Exception as e:
-                    print(f"Error processing table row: {e}")
-
-            # Store the extracted details
-            if property_details:
-                details["property_details"] = property_details
-
-                # Extract some common fields to the top level for easier access
-                if "nutzfläche" in property_details:
-                    area_text = property_details["nutzfläche"]
-                    # Try to extract numeric area value (e.g., "99 m²" -> 99)
-                    try:
-                        area_value = area_text.split()[0].replace(",", ".")
-                        details["area"] = float(area_value)
-                    except (IndexError, ValueError):
-                        details["area_text"] = area_text
-
-                if "bezugstermin" in property_details:
-                    details["available_from"] = property_details["bezugstermin"]
-
-                if "ausstattung" in property_details:
-                    # Split features by comma if they're combined
-                    features_text = property_details["ausstattung"]
-                    additional_features = [f.strip() for f in features_text.split(",")]
-
-                    # Add to existing features or create new list
-                    if "features" not in details:
-                        details["features"] = []
-                    details["features"].extend(additional_features)
-
-                if "etage" in property_details:
-                    floor_str = property_details["etage"].replace(". Etage", "").lower()
-                    if "erdgeschoss" in floor_str:
-                        details["floor"] = 0
-                    elif "parterre" in floor_str:
-                        details["floor"] = 0
-                    else:
-                        details["floor"] = int(floor_str)
-
         except Exception as e:
-            print(f"Error extracting property details table: {e}")
-
-        # Images
-        image_urls = []
-        try:
-            # Try the new gallery structure first
+            # E.g. the client can't be set up (h2 missing), the browser still works
+            logging.error(f"Error fetching details over HTTP, using the browser: {e}")
+            return super().get_apartment_details_batch(apartments)
+
+        results: List[Optional[ApartmentDetails]] = []
+        browser_fallback: List[int] = []
+        for i, (apartment, fetch_result) in enumerate(zip(apartments, fetch_results)):
+            if fetch_result.html is None:
+                browser_fallback.append(i)
+                results.append(None)
+                continue
+
+            self.archive_page("detail", apartment.url, fetch_result.html)
             try:
-                figure_elements = self.driver.find_elements(
-                    By.CSS_SELECTOR, ".flat-detail-gallery figure"
+                results.append(
+                    flatfox_parser.parse_details(fetch_result.html, apartment)
                 )
-                if figure_elements:
-                    for fig in figure_elements:
-                        try:
-                            link_element = fig.find_element(By.TAG_NAME, "a")
-                            img_url = link_element.get_attribute("href")
-                            if img_url and not img_url.endswith("placeholder.jpg"):
-                                image_urls.append(img_url)
-                        except Exception as e:
-                            print(f"Error extracting image from figure: {e}")
-                else:
-                    # Fall back to the old structure
-                    image_elements = self.driver.find_elements(
-                        By.CSS_SELECTOR, ".PropertyGallery img"
-                    )
-                    for img in image_elements:
-                        img_url = img.get_attribute("src")
-                        if img_url and not img_url.endswith("placeholder.jpg"):
-                            image_urls.append(img_url)
             except Exception as e:
-                # If new structure fails, try the old one
-                print(f"Error with new image structure, trying old structure: {e}")
-                image_elements = self.driver.find_elements(
-                    By.CSS_SELECTOR, ".PropertyGallery img"
-                )
-                for img in image_elements:
-                    img_url = img.get_attribute("src")
-                    if img_url and not img_url.endswith("placeholder.jpg"):
-                        image_urls.append(img_url)
-        except Exception as e:
-            print(f"Error extracting images: {e}")
-
-        details["image_urls"] = image_urls
+                logging.error(f"Error parsing details for {apartment.url}: {e}")
+                browser_fallback.append(i)
+                results.append(None)
+
+        # Pages that failed over HTTP get one more try with the browser
+        if browser_fallback:
+            print(f"Falling back to the browser for {len(browser_fallback)} pages")
+            fallback_results = super().get_apartment_details_batch(
+                [apartments[i] for i in browser_fallback]
+            )
+            for i, details in zip(browser_fallback, fallback_results):
+                results[i] = details
 
-        # Convert the dictionary to an ApartmentDetails object
-        return ApartmentDetails(**details)
+        return results
 
     def is_scraped_by_me(self, apartment: ApartmentListing) -> bool:
         return "flatfox.ch" in apartment.url
@@ -412,3 +209,4 @@ class FlatfoxScraper(Scraper):
         """Close the browser"""
         if hasattr(self, "driver"):
             self.driver.quit()
+        self.sessions.report()
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Callable, Optional
+from urllib.parse import urlparse
+import httpx
+from pydantic import BaseModel
+import config
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class FetchResult(BaseModel):
+    url: str
+    status_code: int
+    html: Optional[str] = None
+    not_modified: bool = False
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so the host gets no requests for `seconds` (Retry-After)"""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+        self.updated_at = time.monotonic()
+
+
+class HttpFetcher:
+    """Fetches many pages concurrently over pooled HTTP/2 connections.
+
+    Every host gets its own token bucket, 429/5xx responses are retried with
+    exponential backoff, and ETag / Last-Modified validators are remembered so
+    unchanged pages come back as a cheap 304.
+    """
+
+    def __init__(self, load_cached_body: Callable[[str], Optional[str]] | None = None):
+        # Returns the last known body of a URL, needed to answer a 304
+        self.load_cached_body = load_cached_body
+        self.buckets: dict[str, TokenBucket] = {}
+        self.validators: dict[str, dict[str, str]] = self._load_validators()
+
+    def _load_validators(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(config.HTTP_VALIDATOR_CACHE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_validators(self) -> None:
+        os.makedirs(
+            os.path.dirname(config.HTTP_VALIDATOR_CACHE_FILE) or ".", exist_ok=True
+        )
+        with open(config.HTTP_VALIDATOR_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.validators, f)
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).hostname or ""
+        if host not in self.buckets:
+            rates = config.HTTP_REQUESTS_PER_SECOND
+            rate = next(
+                (rate for domain, rate in rates.items() if host.endswith(domain)),
+                rates["default"],
+            )
+            self.buckets[host] = TokenBucket(rate, config.HTTP_BURST)
+        return self.buckets[host]
+
+    def _conditional_headers(self, url: str) -> dict[str, str]:
+        # Without a stored body a 304 would be useless, so only ask when we have one
+        validators = self.validators.get(url)
+        if not validators or self.load_cached_body is None:
+            return {}
+
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def _remember_validators(self, response: httpx.Response) -> None:
+        validators = {}
+        if "etag" in response.headers:
+            validators["etag"] = response.headers["etag"]
+        if "last-modified" in response.headers:
+            validators["last_modified"] = response.headers["last-modified"]
+        if validators:
+            self.validators[str(response.request.url)] = validators
+
+    async def _fetch(
+        self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str
+    ) -> FetchResult:
+        bucket = self._bucket(url)
+        for attempt in range(config.HTTP_MAX_RETRIES + 1):
+            await bucket.acquire()
+            try:
+                async with semaphore:
+                    response = await client.get(
+                        url, headers=self._conditional_headers(url)
+                    )
+            except httpx.TransportError as e:
+                logging.warning(f"Error fetching {url}: {e}")
+                retry_after = None
+                status_code = 0
+            except (httpx.HTTPError, httpx.InvalidURL) as e:
+                # E.g. a redirect loop or a malformed URL, retrying won't help
+                logging.warning(f"Error fetching {url}: {e}")
+                return FetchResult(url=url, status_code=0)
+            else:
+                status_code = response.status_code
+                if status_code == 304 and self.load_cached_body is not None:
+                    html = self.load_cached_body(url)
+                    if html is not None:
+                        return FetchResult(
+                            url=url, status_code=304, html=html, not_modified=True
+                        )
+                if status_code == 200:
+                    self._remember_validators(response)
+                    return FetchResult(url=url, status_code=200, html=response.text)
+                if status_code not in RETRY_STATUS_CODES:
+                    return FetchResult(url=url, status_code=status_code)
+                retry_after = response.headers.get("retry-after")
+
+            if attempt == config.HTTP_MAX_RETRIES:
+                break
+
+            # Exponential backoff with jitter, unless the server told us how long
+            delay = 2**attempt + random.random()
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            bucket.pause(delay)
+            logging.warning(f"Retrying {url} in {delay:.1f}s (status {status_code})")
+
+        return FetchResult(url=url, status_code=status_code)
+
+    async def fetch_all_async(self, urls: list[str]) -> list[FetchResult]:
+        semaphore = asyncio.Semaphore(config.HTTP_MAX_CONCURRENCY)
+        async with httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=config.HTTP_TIMEOUT_SECONDS,
+            headers={
+                "User-Agent": config.HTTP_USER_AGENT,
+                "Accept-Language": "de-CH,de;q=0.9",
+            },
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONCURRENCY,
+                max_keepalive_connections=config.HTTP_MAX_CONCURRENCY,
+            ),
+        ) as client:
+            return await asyncio.gather(
+                *(self._fetch(client, semaphore, url) for url in urls)
+            )
+
+    def fetch_all(self, urls: list[str]) -> list[FetchResult]:
+        """Fetch all URLs concurrently, results are in the order of `urls`"""
+        start = time.perf_counter()
+        results = asyncio.run(self.fetch_all_async(urls))
+        self._save_validators()
+
+        not_modified = sum(result.not_modified for result in results)
+        failed = sum(result.html is None for result in results)
+        print(
+            f"Fetched {len(urls)} pages over HTTP in {time.perf_counter() - start:.1f}s "
+            f"({not_modified} not modified, {failed} failed)"
+        )
+        return results
@@ -0,0 +1,210 @@
+"""Pure functions that turn archived immoscout24.ch pages into apartment models"""
+
+from typing import List
+import logging
+from selectolax.parser import HTMLParser
+from models.apartment_models import ApartmentListing, ApartmentDetails
+from scrapers.parsing import absolute_url, css_text, node_text, parse_html
+
+
+def parse_listings(html: str, page_url: str) -> List[ApartmentListing]:
+    """Extract all listing cards of a search result page"""
+    tree = parse_html(html)
+    apartments: List[ApartmentListing] = []
+
+    for card in tree.css("div[role='list'] div[role='listitem']"):
+        try:
+            # Get link element and URL
+            link_element = card.css_first("a.HgCardElevated_content_uir_2")
+            full_url = absolute_url(
+                page_url, link_element.attributes.get("href") if link_element else None
+            )
+
+            if full_url is None:
+                print("No URL found for the listing")
+                continue
+
+            # Rooms/area/price
+            price_info = (
+                css_text(
+                    card, ".HgListingRoomsLivingSpacePrice_roomsLivingSpacePrice_M6Ktp"
+                )
+                or "N/A"
+            )
+
+            # The address doubles as the title
+            location = css_text(card, "address") or "N/A"
+
+            apartments.append(
+                ApartmentListing(
+                    title=location,
+                    price=price_info,
+                    location=location,
+                    url=full_url,
+                )
+            )
+        except Exception as e:
+            print(f"Error parsing apartment card: {e}")
+
+    return apartments
+
+
+def parse_details(html: str, apartment: ApartmentListing) -> ApartmentDetails:
+    """Extract detailed information about an apartment from its detail page"""
+    tree = parse_html(html)
+    details = apartment.model_dump()
+
+    details["title"] = _parse_title(tree, apartment)
+    details["street"], details["city"] = _parse_address(tree, apartment)
+    details["rooms"] = _parse_rooms(tree, apartment)
+    details["area"], details["area_text"] = _parse_area(tree, apartment)
+    details["price"] = _parse_price(tree, apartment)
+    details["property_details"], details["available_from"] = (
+        _parse_property_details(tree, apartment)
+    )
+    details["description"] = _parse_description(tree, apartment)
+    details["image_urls"] = _parse_image_urls(tree, apartment.url)
+    details["features"] = _parse_features(tree)
+
+    return ApartmentDetails(**details)
+
+
+def _parse_title(tree: HTMLParser, apartment: ApartmentListing) -> str:
+    title = css_text(tree, "h1.ListingTitle_spotlightTitle_ENVSi")
+    if not title:
+        logging.error(f"Error extracting title: {apartment.url}")
+    return title
+
+
+def _parse_address(tree: HTMLParser, apartment: ApartmentListing) -> tuple[str, str]:
+    """
+    Extracts the street and city from the apartment's address.
+
+    Returns:
+        A tuple containing the street and city information.
+    """
+    address_element = tree.css_first("address.AddressDetails_address_i3koO")
+    if address_element is None:
+        logging.warning(f"Error extracting address: {apartment.url}")
+        return "", ""
+
+    address_text = node_text(address_element)
+
+    street = css_text(address_element, "span.AddressDetails_street_nXScL")
+    if street.endswith(","):
+        street = street[:-1]  # Remove trailing comma
+
+    # Get the city info - it's in the second span
+    city_spans = address_element.css("span")
+    if len(city_spans) > 1:
+        city_info = node_text(city_spans[1])
+    elif "," in address_text:
+        # If we can't get it directly, extract from full address
+        _, city_info = address_text.split(",", 1)
+        city_info = city_info.strip()
+    else:
+        city_info = ""
+
+    return street, city_info
+
+
+def _parse_rooms(tree: HTMLParser, apartment: ApartmentListing) -> float:
+    rooms_text = css_text(tree, ".SpotlightAttributesNumberOfRooms_value_TUMrd")
+    try:
+        return float(rooms_text)
+    except ValueError as e:
+        logging.warning(f"Error extracting number of rooms: {e} {apartment.url}")
+        return 0.0
+
+
+def _parse_area(tree: HTMLParser, apartment: ApartmentListing) -> tuple[float, str]:
+    area_text = css_text(tree, ".SpotlightAttributesUsableSpace_value_cpfrh")
+    try:
+        # Try to extract numeric area value
+        area_value = area_text.split()[0].replace("'", "").replace(",", ".")
+        return float(area_value), area_text
+    except (IndexError, ValueError):
+        logging.warning(f"Error extracting area value: {area_text} {apartment.url}")
+        return 0.0, area_text
+
+
+def _parse_price(tree: HTMLParser, apartment: ApartmentListing) -> str:
+    price_element = tree.css_first(".SpotlightAttributesPrice_value_TqKGz")
+    if price_element is None:
+        logging.warning(f"Error extracting price: {apartment.url}")
+        return ""
+
+    price_text = node_text(price_element)
+    # Also get the currency
+    currency = css_text(price_element, ".SpotlightAttributesPrice_currency_fiCzT")
+
+    return f"{currency} {price_text}"
+
+
+def _parse_property_details(
+    tree: HTMLParser, apartment: ApartmentListing
+) -> tuple[dict[str, str], str]:
+    property_details: dict[str, str] = {}
+    available_from = ""
+
+    core_attributes = tree.css_first(".CoreAttributes_coreAttributes_e2NAm")
+    if core_attributes is None:
+        logging.warning(f"Error extracting core attributes: {apartment.url}")
+        return property_details, available_from
+
+    # Get all dt/dd pairs
+    for dt, dd in zip(core_attributes.css("dt"), core_attributes.css("dd")):
+        key = node_text(dt).rstrip(":")
+        value = node_text(dd)
+
+        if key and value:
+            # Clean up the key for dictionary
+            key_cleaned = key.lower().replace(" ", "_").replace(":", "")
+            property_details[key_cleaned] = value
+
+            # Extract specific properties to top level
+            if "availability" in key_cleaned:
+                available_from = value
+
+    return property_details, available_from
+
+
+def _parse_description(tree: HTMLParser, apartment: ApartmentListing) -> str:
+    description = css_text(tree, ".Description_descriptionBody_AYyuy")
+    if not description:
+        logging.warning(f"Error extracting description: {apartment.url}")
+    return description
+
+
+def _parse_features(tree: HTMLParser) -> List[str]:
+    """Extract features from the apartment listing's 'Eigenschaften' (Properties) section"""
+    features = []
+    for item in tree.css(".FeaturesFurnishings_list_S54KV li"):
+        # The text is inside a paragraph element
+        feature_text = css_text(item, "p")
+        if feature_text:
+            features.append(feature_text)
+    return features
+
+
+def _parse_image_urls(tree: HTMLParser, page_url: str) -> List[str]:
+    """Extract all image URLs from the image carousel"""
+    image_urls = []
+    seen_urls = set()
+
+    # Carousel clones repeat the first/last slides, so skip them
+    for img in tree.css(".glide__slide:not(.glide__slide--clone) img"):
+        img_srcset = img.attributes.get("srcset")
+        if img_srcset:
+            # Get the largest image (last one in srcset)
+            img_url = img_srcset.split(",")[-1].strip().split(" ")[0]
+        else:
+            # Fallback to src if srcset isn't available
+            img_url = img.attributes.get("src")
+
+        img_url = absolute_url(page_url, img_url)
+        if img_url and img_url not in seen_urls:
+            image_urls.append(img_url)
+            seen_urls.add(img_url)
+
+    return image_urls
@@ -0,0 +1,60 @@
+from urllib.parse import urljoin
+from selectolax.parser import HTMLParser, Node
+
+# Elements that start a new line in the rendered text, like Selenium's `.text`
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "br",
+    "dd",
+    "div",
+    "dt",
+    "figcaption",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "li",
+    "ol",
+    "p",
+    "section",
+    "table",
+    "td",
+    "tr",
+    "ul",
+}
+
+
+def parse_html(html: str) -> HTMLParser:
+    return HTMLParser(html)
+
+
+def node_text(node: Node | None) -> str:
+    """Approximate the rendered text of a node, one line per block element"""
+    if node is None:
+        return ""
+
+    parts: list[str] = []
+    for child in node.traverse(include_text=True):
+        if child.tag == "-text":
+            parts.append(child.text_content or "")
+        elif child.tag in BLOCK_TAGS:
+            parts.append("\n")
+
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def css_text(node: HTMLParser | Node, selector: str) -> str:
+    """Return the text of the first match of `selector`, or "" if there is none"""
+    return node_text(node.css_first(selector))
+
+
+def absolute_url(page_url: str, href: str | None) -> str | None:
+    """Resolve an href the way the browser does for `get_attribute("href")`"""
+    if not href:
+        return None
+    return urljoin(page_url, href)
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from models.job_queue import Job, JobQueue, JobStage
+
+
+class SqliteJobQueue(JobQueue):
+    """Job queue in a SQLite file, so the pipeline runs locally with no services.
+
+    Leasing happens in an immediate transaction, so workers in several processes
+    (or on several machines sharing the file over a network drive with working
+    file locks) never take the same job. A job is given up after `max_attempts`
+    leases that failed or expired. The connection is shared by the threads of a
+    worker, so a job's lease can be renewed while it runs.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Transactions are explicit, and workers wait for each other's locks
+        self.db = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.lock = threading.Lock()
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_until REAL NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL,
+                UNIQUE (stage, key)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_by_stage ON jobs (stage, status, id);
+            """
+        )
+
+    def enqueue(self, stage: JobStage, key: str, payload: Optional[str] = None) -> None:
+        with self.lock:
+            # A pending or leased job is already on its way and is left alone
+            self.db.execute(
+                """
+                INSERT INTO jobs (stage, key, payload, status, updated_at)
+                VALUES (?, ?, ?, 'pending', ?)
+                ON CONFLICT (stage, key) DO UPDATE SET
+                    payload = excluded.payload,
+                    status = 'pending',
+                    attempts = 0,
+                    lease_until = 0,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE status IN ('done', 'failed')
+                """,
+                (stage, key, payload, datetime.now().isoformat()),
+            )
+
+    def lease(
+        self, stage: JobStage, worker: str, visibility_timeout: float, limit: int = 1
+    ) -> list[Job]:
+        with self.lock:
+            now = time.time()
+            updated_at = datetime.now().isoformat()
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose last lease expired are not retried forever
+                self.db.execute(
+                    """
+                    UPDATE jobs SET status = 'failed', error = 'lease expired',
+                        updated_at = ?
+                    WHERE stage = ? AND status = 'leased' AND lease_until < ?
+                        AND attempts >= ?
+                    """,
+                    (updated_at, stage, now, self.max_attempts),
+                )
+                rows = self.db.execute(
+                    """
+                    SELECT id, stage, key, payload, attempts FROM jobs
+                    WHERE stage = ? AND (status = 'pending'
+                        OR (status = 'leased' AND lease_until < ?))
+                    ORDER BY id LIMIT ?
+                    """,
+                    (stage, now, limit),
+                ).fetchall()
+                self.db.executemany(
+                    """
+                    UPDATE jobs SET status = 'leased', attempts = attempts + 1,
+                        lease_until = ?, worker = ?, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    [
+                        (now + visibility_timeout, worker, updated_at, row[0])
+                        for row in rows
+                    ],
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+            return [
+                Job(id=id, stage=stage, key=key, payload=payload, attempts=attempts + 1)
+                for id, stage, key, payload, attempts in rows
+            ]
+
+    def extend(self, job: Job, worker: str, visibility_timeout: float) -> bool:
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + visibility_timeout, job.id, worker),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job: Job, worker: str) -> None:
+        with self.lock:
+            # A job whose lease expired belongs to another worker by now
+            self.db.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (datetime.now().isoformat(), job.id, worker),
+            )
+
+    def fail(self, job: Job, worker: str, error: str) -> None:
+        with self.lock:
+            status = "failed" if job.attempts >= self.max_attempts else "pending"
+            self.db.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = 0, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (status, error, datetime.now().isoformat(), job.id, worker),
+            )
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            counts: dict[str, dict[str, int]] = {}
+            for stage, status, count in self.db.execute(
+                "SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status"
+            ):
+                counts.setdefault(stage, {})[status] = count
+            return counts
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,46 @@
+import os
+from functools import lru_cache
+from typing import Any, Iterable
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _adapter(item_type: type) -> TypeAdapter:
+    return TypeAdapter(item_type)
+
+
+def write_json_records(
+    path: str,
+    records: Iterable[Any],
+    item_type: type,
+    compact: bool = False,
+) -> int:
+    """Write records as a JSON array, serializing one record at a time to bytes.
+
+    Every record goes straight through pydantic-core, so no list of dicts or
+    single string of the whole file is ever built. The indented layout is the one
+    `dump_json(indent=2)` produces for the whole list; `compact` leaves out all
+    whitespace for machine consumers. The file is replaced atomically, so readers
+    never see a partial array.
+
+    Returns the number of records written.
+    """
+    adapter = _adapter(item_type)
+    separator, opening, closing = (b",", b"[", b"]")
+    if not compact:
+        separator, opening, closing = (b",\n  ", b"[\n  ", b"\n]")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(f"{path}.tmp", "wb") as f:
+        for record in records:
+            f.write(separator if count else opening)
+            if compact:
+                f.write(adapter.dump_json(record))
+            else:
+                # JSON strings escape newlines, so every raw newline is layout
+                f.write(adapter.dump_json(record, indent=2).replace(b"\n", b"\n  "))
+            count += 1
+        f.write(closing if count else b"[]")
+    os.replace(f"{path}.tmp", path)
+    return count
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, Literal, Optional
+import zstandard
+from pydantic import BaseModel
+
+PageKind = Literal["overview", "detail"]
+
+
+class ArchivedPage(BaseModel):
+    """Index entry for one fetched page"""
+
+    portal: str
+    kind: PageKind
+    url: str
+    fetched_at: datetime
+    content_hash: str
+
+
+class ArchiveStats(BaseModel):
+    """Size of the archive and write throughput of the current session"""
+
+    pages: int
+    unique_bodies: int
+    raw_bytes: int
+    stored_bytes: int
+    session_pages: int
+    session_new_bodies: int
+    session_raw_bytes: int
+    session_write_seconds: float
+
+
+class PageArchive:
+    """Content-addressed archive of the raw HTML of every fetched page.
+
+    Page bodies are stored once per SHA-256 of their content as zstd files under
+    `objects/`, and an SQLite index maps every fetch (portal, kind, url, time) to
+    its body, so refetching an unchanged page costs one index row.
+    """
+
+    def __init__(self, directory: str, compression_level: int = 10):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.compression_level = compression_level
+        self._db: Optional[sqlite3.Connection] = None
+        # Parallel browser sessions share one archive
+        self._lock = threading.RLock()
+        self._compressor: Optional[zstandard.ZstdCompressor] = None
+        self._decompressor: Optional[zstandard.ZstdDecompressor] = None
+
+        self._session_pages = 0
+        self._session_new_bodies = 0
+        self._session_raw_bytes = 0
+        self._session_write_seconds = 0.0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Opened lazily, so parser workers that only read bodies never touch the index
+        with self._lock:
+            if self._db is None:
+                self._db = self._open_db()
+        return self._db
+
+    def _open_db(self) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"), check_same_thread=False
+        )
+        db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                portal TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at);
+            CREATE TABLE IF NOT EXISTS bodies (
+                content_hash TEXT PRIMARY KEY,
+                raw_size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL
+            );
+            """
+        )
+        return db
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(
+            self.objects_dir, content_hash[:2], f"{content_hash}.html.zst"
+        )
+
+    def save(self, portal: str, kind: PageKind, url: str, html: str) -> ArchivedPage:
+        start = time.perf_counter()
+        body = html.encode("utf-8")
+        content_hash = hashlib.sha256(body).hexdigest()
+
+        with self._lock:
+            path = self._object_path(content_hash)
+            if not os.path.exists(path):
+                if self._compressor is None:
+                    self._compressor = zstandard.ZstdCompressor(
+                        level=self.compression_level
+                    )
+                compressed = self._compressor.compress(body)
+
+                # Write to a temporary file first so a crash never leaves a partial body
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(compressed)
+                os.replace(f"{path}.tmp", path)
+
+                self.db.execute(
+                    "INSERT OR IGNORE INTO bodies VALUES (?, ?, ?)",
+                    (content_hash, len(body), len(compressed)),
+                )
+                self._session_new_bodies += 1
+
+            page = ArchivedPage(
+                portal=portal,
+                kind=kind,
+                url=url,
+                fetched_at=datetime.now(),
+                content_hash=content_hash,
+            )
+            self.db.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?)",
+                (portal, kind, url, page.fetched_at.isoformat(), content_hash),
+            )
+            self.db.commit()
+
+            self._session_pages += 1
+            self._session_raw_bytes += len(body)
+            self._session_write_seconds += time.perf_counter() - start
+
+        return page
+
+    def load(self, page: ArchivedPage) -> str:
+        if self._decompressor is None:
+            self._decompressor = zstandard.ZstdDecompressor()
+        with open(self._object_path(page.content_hash), "rb") as f:
+            return self._decompressor.decompress(f.read()).decode("utf-8")
+
+    def pages(
+        self, kind: Optional[PageKind] = None, latest_only: bool = True
+    ) -> Iterator[ArchivedPage]:
+        """Iterate over archived pages, by default only the latest fetch of every URL"""
+        query = "SELECT portal, kind, url, MAX(fetched_at), content_hash FROM pages"
+        if not latest_only:
+            query = "SELECT portal, kind, url, fetched_at, content_hash FROM pages"
+
+        params: tuple[str, ...] = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        if latest_only:
+            query += " GROUP BY kind, url"
+
+        for portal, page_kind, url, fetched_at, content_hash in self.db.execute(
+            query, params
+        ):
+            yield ArchivedPage(
+                portal=portal,
+                kind=page_kind,
+                url=url,
+                fetched_at=datetime.fromisoformat(fetched_at),
+                content_hash=content_hash,
+            )
+
+    def history(self, url: str) -> list[ArchivedPage]:
+        """All fetches of a URL, oldest first"""
+        return [
+            ArchivedPage(
+                portal=portal,
+                kind=kind,
+                url=url,
+                fetched_at=datetime.fromisoformat(fetched_at),
+                content_hash=content_hash,
+            )
+            for portal, kind, fetched_at, content_hash in self.db.execute(
+                "SELECT portal, kind, fetched_at, content_hash FROM pages "
+                "WHERE url = ? ORDER BY fetched_at",
+                (url,),
+            )
+        ]
+
+    def latest_body(self, url: str) -> Optional[str]:
+        """The body of the most recent fetch of a URL, if it was ever archived"""
+        pages = self.history(url)
+        return self.load(pages[-1]) if pages else None
+
+    def stats(self) -> ArchiveStats:
+        pages = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        unique_bodies, raw_bytes, stored_bytes = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) "
+            "FROM bodies"
+        ).fetchone()
+        return ArchiveStats(
+            pages=pages,
+            unique_bodies=unique_bodies,
+            raw_bytes=raw_bytes,
+            stored_bytes=stored_bytes,
+            session_pages=self._session_pages,
+            session_new_bodies=self._session_new_bodies,
+            session_raw_bytes=self._session_raw_bytes,
+            session_write_seconds=self._session_write_seconds,
+        )
+
+    def report(self) -> None:
+        stats = self.stats()
+        ratio = stats.raw_bytes / stats.stored_bytes if stats.stored_bytes else 0
+        print(
+            f"Page archive: {stats.pages} pages, {stats.unique_bodies} unique bodies, "
+            f"{stats.stored_bytes / 1024 / 1024:.1f}MB stored "
+            f"({stats.raw_bytes / 1024 / 1024:.1f}MB raw, {ratio:.1f}x)"
+        )
+        if stats.session_pages:
+            throughput = (
+                stats.session_raw_bytes / 1024 / 1024 / stats.session_write_seconds
+                if stats.session_write_seconds
+                else 0
+            )
+            print(
+                f"  this run: {stats.session_pages} pages written "
+                f"({stats.session_new_bodies} new bodies) at {throughput:.1f}MB/s"
+            )
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Literal, Optional
+
+Stage = Literal["overview", "details", "criteria"]
+
+
+class RunJournal:
+    """Records which stages every listing has completed, so a crashed run resumes.
+
+    Each completed stage is stored with an optional payload (e.g. the scraped
+    details as JSON) and a version, so results produced with other settings (a
+    changed criteria list or model) are not mistaken for completed work. Image
+    descriptions are journaled individually, keyed by image URL and prompt version,
+    and the attributes extracted from an image by the hash of its content.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Stage workers in other processes may hold the lock for a moment
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS stages (
+                url TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                version TEXT NOT NULL,
+                completed_at TEXT NOT NULL,
+                payload TEXT,
+                PRIMARY KEY (url, stage, version)
+            );
+            CREATE TABLE IF NOT EXISTS image_descriptions (
+                image_url TEXT NOT NULL,
+                version TEXT NOT NULL,
+                description TEXT NOT NULL,
+                PRIMARY KEY (image_url, version)
+            );
+            CREATE TABLE IF NOT EXISTS image_attributes (
+                image_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                attributes TEXT NOT NULL,
+                PRIMARY KEY (image_hash, version)
+            );
+            """
+        )
+
+    def mark(
+        self, url: str, stage: Stage, payload: Optional[str] = None, version: str = ""
+    ) -> None:
+        self.mark_many([url], stage, [payload], version)
+
+    def mark_many(
+        self,
+        urls: list[str],
+        stage: Stage,
+        payloads: Optional[list[Optional[str]]] = None,
+        version: str = "",
+    ) -> None:
+        completed_at = datetime.now().isoformat()
+        payloads = payloads or [None] * len(urls)
+        self.db.executemany(
+            "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)",
+            [
+                (url, stage, version, completed_at, payload)
+                for url, payload in zip(urls, payloads)
+            ],
+        )
+        self.db.commit()
+
+    def completed(self, stage: Stage, version: str = "") -> dict[str, Optional[str]]:
+        """URLs that completed `stage`, mapped to their payload"""
+        return dict(
+            self.db.execute(
+                "SELECT url, payload FROM stages WHERE stage = ? AND version = ?",
+                (stage, version),
+            ).fetchall()
+        )
+
+    def payload(self, url: str, stage: Stage, version: str = "") -> Optional[str]:
+        row = self.db.execute(
+            "SELECT payload FROM stages WHERE url = ? AND stage = ? AND version = ?",
+            (url, stage, version),
+        ).fetchone()
+        return row[0] if row else None
+
+    def latest_payloads(self, stage: Stage) -> dict[str, Optional[str]]:
+        """The most recent payload of `stage` for every URL, in any version"""
+        return dict(
+            self.db.execute(
+                "SELECT url, payload FROM stages WHERE stage = ? ORDER BY completed_at",
+                (stage,),
+            ).fetchall()
+        )
+
+    def completed_urls(self, stage: Stage, version: str = "") -> set[str]:
+        """URLs that completed `stage`, without loading the payloads"""
+        return {
+            url
+            for (url,) in self.db.execute(
+                "SELECT url FROM stages WHERE stage = ? AND version = ?",
+                (stage, version),
+            )
+        }
+
+    def outdated_urls(self, stage: Stage, since_stage: Stage) -> set[str]:
+        """URLs whose `stage` completed before their latest `since_stage`, e.g.
+        details scraped before the overview saw the listing change"""
+        return {
+            url
+            for (url,) in self.db.execute(
+                "SELECT done.url FROM stages AS done JOIN stages AS since "
+                "ON since.url = done.url AND since.stage = ? "
+                "WHERE done.stage = ? AND since.completed_at > done.completed_at",
+                (since_stage, stage),
+            )
+        }
+
+    def reset(self, urls: list[str], stages: list[Stage]) -> None:
+        """Forget `stages` of `urls` in every version, so they are redone"""
+        self.db.executemany(
+            "DELETE FROM stages WHERE url = ? AND stage = ?",
+            [(url, stage) for url in urls for stage in stages],
+        )
+        self.db.commit()
+
+    def completed_at(
+        self, url: str, stage: Stage, version: str = ""
+    ) -> Optional[datetime]:
+        row = self.db.execute(
+            "SELECT completed_at FROM stages WHERE url = ? AND stage = ? AND version = ?",
+            (url, stage, version),
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def image_description(self, image_url: str, version: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT description FROM image_descriptions "
+            "WHERE image_url = ? AND version = ?",
+            (image_url, version),
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_image_description(
+        self, image_url: str, version: str, description: str
+    ) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO image_descriptions VALUES (?, ?, ?)",
+            (image_url, version, description),
+        )
+        self.db.commit()
+
+    def image_attributes(self, image_hash: str, version: str) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT attributes FROM image_attributes "
+            "WHERE image_hash = ? AND version = ?",
+            (image_hash, version),
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_image_attributes(
+        self, image_hash: str, version: str, attributes: str
+    ) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO image_attributes VALUES (?, ?, ?)",
+            (image_hash, version, attributes),
+        )
+        self.db.commit()
+
+    def clear(self) -> None:
+        self.db.executescript(
+            "DELETE FROM stages; DELETE FROM image_descriptions; "
+            "DELETE FROM image_attributes;"
+        )
+
+    def close(self) -> None:
+        self.db.close()
@@ -1,16 +1,58 @@
-import json
+import os
+import config
 from config import CRITERIA
 from image_analyzer import ImageAnalyzer
 import pandas as pd
 from tqdm import tqdm
 
-from models.apartment_models import ApartmentDetails, ApartmentAnalyzed, FilterResult
+from models.apartment_models import (
+    ApartmentAnalyzed,
+    ApartmentDetails,
+    FilterResult,
+    apartment_analyzed_list_adapter,
+)
+from models.compact_models import CompactDetails
+from storage.json_writer import write_json_records
+from storage.run_journal import RunJournal
+
+
+def analyze_listing(
+    apartment: ApartmentDetails, image_analyzer: ImageAnalyzer
+) -> ApartmentAnalyzed:
+    """Evaluate the criteria for one apartment and print the result"""
+    met_criteria, apartment_summary, decided_by = image_analyzer.analyze(apartment)
+    # Check if all criteria are met
+    all_criteria_met = all(met_criteria.values())
+
+    # Print result summary
+    print(f"Results for: {apartment.title} {apartment.url}")
+    print(f"  - Meets all criteria: {all_criteria_met}")
+    for criterion, met in met_criteria.items():
+        print(f"  - {criterion}: {'✓' if met else '✗'}")
+
+    return ApartmentAnalyzed(
+        **apartment.model_dump(),
+        apartment_summary=apartment_summary,
+        filter_result=FilterResult(
+            meets_all_criteria=all_criteria_met,
+            criteria_results=met_criteria,
+            decided_by=decided_by,
+        ),
+    )
+
 
+def analyze_listings(
+    apartment_details: list[CompactDetails],
+    image_analyzer: ImageAnalyzer,
+    journal: RunJournal | None = None,
+    merge: bool = False,
+):
+    """Evaluate the criteria of every apartment and write the output files.
 
-def analyze_listings(apartment_details: list[ApartmentDetails]):
-    # Step 2: Initialize image analyzer
-    print("Initializing image analyzer...")
-    image_analyzer = ImageAnalyzer()
+    With `merge`, the results replace those of the same listings in the existing
+    output files and every other listing is kept, instead of rebuilding the files
+    from `apartment_details` alone.
+    """
 
     # Step 3: Initialize apartment filter
     print("Setting up apartment filter with criteria:")
@@ -21,70 +63,92 @@ def analyze_listings(apartment_details: list[ApartmentDetails]):
     print("\nProcessing apartments (this may take some time)...")
     criteria_results = []
 
-    # For demo purposes, limit to first 10 apartments
-    processing_limit = min(10, len(apartment_details))
+    # Apartments evaluated by an earlier run with the same model and criteria
+    completed: dict[str, str | None] = {}
+    if journal is not None:
+        criteria_version = image_analyzer.criteria_version()
+        completed = journal.completed("criteria", version=criteria_version)
 
     for i, apt in tqdm(enumerate(apartment_details)):
         # print(f"\nProcessing apartment {i + 1}/{processing_limit}: {apt['title']}")
 
-        # Filter apartment
-        met_criteria, apartment_summary = image_analyzer.analyze(apt)
-        # Check if all criteria are met
-        all_criteria_met = all(met_criteria.values())
-
-        # Store results
-        apartment_result = ApartmentAnalyzed(
-            **apt.model_dump(),
-            apartment_summary=apartment_summary,
-            filter_result=FilterResult(
-                meets_all_criteria=all_criteria_met,
-                criteria_results=met_criteria,
-            ),
-        )
+        payload = completed.get(apt.url)
+        if payload is not None:
+            criteria_results.append(ApartmentAnalyzed.model_validate_json(payload))
+            continue
 
+        apartment_result = analyze_listing(apt.to_model(), image_analyzer)
         criteria_results.append(apartment_result)
 
-        # Print result summary
-        print(f"Results for: {apt.title} {apt.url}")
-        print(f"  - Meets all criteria: {all_criteria_met}")
-        for criterion, met in met_criteria.items():
-            print(f"  - {criterion}: {'✓' if met else '✗'}")
+        # No criterion answered means the backend call failed, so it is retried
+        # next run
+        if journal is not None and apartment_result.filter_result.decided_by:
+            journal.mark(
+                apt.url,
+                "criteria",
+                apartment_result.model_dump_json(),
+                version=criteria_version,
+            )
 
     # Step 5: Save final results
     filtered_apartments = [
-        apt for apt in criteria_results if apt["filter_result"]["meets_all_criteria"]
+        apt for apt in criteria_results if apt.filter_result.meets_all_criteria
     ]
 
+    json_file = "output/filtered_apartments.json"
+    csv_file = "output/filtered_apartments.csv"
+    analysed_urls = {apt.url for apt in criteria_results}
+    if merge and os.path.exists(json_file):
+        with open(json_file, "r", encoding="utf-8") as f:
+            filtered_apartments = [
+                apt
+                for apt in apartment_analyzed_list_adapter.validate_json(f.read())
+                if apt.url not in analysed_urls
+            ] + filtered_apartments
+
     # Save as JSON
-    with open("output/filtered_apartments.json", "w") as f:
-        json.dump(filtered_apartments, f, indent=2)
+    write_json_records(
+        json_file,
+        filtered_apartments,
+        ApartmentAnalyzed,
+        compact=config.COMPACT_JSON_OUTPUT,
+    )
 
     # Save as CSV
     flat_results = []
     for apt in criteria_results:
         flat_apt = {
-            "title": apt["title"],
-            "price_details": apt.get("price_details", ""),
-            "street": apt.get("street", ""),
-            "city_info": apt.get("city_info", ""),
-            "url": apt["url"],
-            "meets_all_criteria": apt["filter_result"]["meets_all_criteria"],
-            "apartment_summary": apt["apartment_summary"],
+            "title": apt.title,
+            "price_details": apt.price_details or "",
+            "street": apt.street or "",
+            "city_info": apt.city or "",
+            "url": apt.url,
+            "meets_all_criteria": apt.filter_result.meets_all_criteria,
+            "apartment_summary": apt.apartment_summary,
         }
 
         # Add criteria results
-        for criterion, met in apt["filter_result"]["criteria_results"].items():
+        for criterion, met in apt.filter_result.criteria_results.items():
             flat_apt[criterion] = met
 
         flat_results.append(flat_apt)
 
     df = pd.DataFrame(flat_results)
-    df.to_csv("output/filtered_apartments.csv", index=False)
+    if merge and os.path.exists(csv_file):
+        existing_df = pd.read_csv(csv_file)
+        df = pd.concat(
+            [existing_df.loc[~existing_df["url"].isin(analysed_urls)], df],
+            ignore_index=True,
+        )
+    df.to_csv(csv_file, index=False)
 
     print(f"\nProcessing complete!")
+    image_analyzer.report_cascade()
     print(
-        f"Found {len(filtered_apartments)} apartments matching all criteria out of {processing_limit} processed"
+        f"Found {sum(apt.filter_result.meets_all_criteria for apt in criteria_results)}"
+        " apartments matching all criteria out of "
+        f"{len(criteria_results)} processed"
     )
     print(f"Results saved to:")
-    print(f"  - output/filtered_apartments.csv")
-    print(f"  - output/filtered_apartments.json")
+    print(f"  - {csv_file}")
+    print(f"  - {json_file}")
@@ -1,29 +1,45 @@
 import os
 import logging
-from tqdm import tqdm
+import config
 from models.scraper import Scraper
-from models.apartment_models import (
-    ApartmentDetails,
-    ApartmentListing,
-    apartment_detail_list_adapter,
-)
+from storage.json_writer import write_json_records
+from storage.run_journal import RunJournal
+from models.apartment_models import ApartmentListing
+from models.compact_models import CompactDetails, compact_detail_list_adapter
 
 
 def scrape_details(
-    scrapers: list[Scraper], apartments: list[ApartmentListing]
-) -> list[ApartmentDetails]:
+    scrapers: list[Scraper],
+    apartments: list[ApartmentListing],
+    journal: RunJournal | None = None,
+    refresh_urls: set[str] | None = None,
+) -> list[CompactDetails]:
+    """Scrape the details of apartments that have none yet.
+
+    Apartments in `refresh_urls` changed on the overview page, so their details
+    are scraped again and their earlier analysis is discarded. With a journal,
+    this includes every listing the overview stage marked after its details.
+    """
     print("load apartment details")
+    refresh_urls = set(refresh_urls or ())
+    if journal is not None:
+        # Listings an earlier overview run found changed, e.g. when the overview
+        # and details are scraped by separate commands
+        refresh_urls |= journal.outdated_urls("details", "overview") & {
+            apt.url for apt in apartments
+        }
 
     # File path for apartment details
     output_file = "output/apartments_details.json"
 
-    # Load existing apartment details if file exists
-    existing_details: list[ApartmentDetails] = []
+    # Load existing apartment details if file exists, as compact records since the
+    # history only grows
+    existing_details: list[CompactDetails] = []
     existing_urls = set()
     if os.path.exists(output_file):
         try:
             with open(output_file, "r", encoding="utf-8") as f:
-                existing_details = apartment_detail_list_adapter.validate_json(f.read())
+                existing_details = compact_detail_list_adapter.validate_json(f.read())
 
                 # Create a set of URLs that we already have details for
                 existing_urls = {apt.url for apt in existing_details}
@@ -31,35 +47,78 @@ def scrape_details(
         except Exception as e:
             logging.error(f"Error loading existing details: {e}")
 
+    if journal is not None:
+        # Details written before the journal existed, recorded once so the overview
+        # stage doesn't hand them over again
+        journaled_urls = journal.completed_urls("details")
+        unjournaled = [url for url in existing_urls if url not in journaled_urls]
+        if unjournaled:
+            journal.mark_many(unjournaled, "details")
+
+    if refresh_urls:
+        existing_details = [d for d in existing_details if d.url not in refresh_urls]
+        existing_urls -= refresh_urls
+        if journal is not None:
+            journal.reset(list(refresh_urls), ["details", "criteria"])
+
+    # Details scraped by a run that crashed before writing the output file
+    if journal is not None:
+        journaled_details = compact_detail_list_adapter.validate_json(
+            "["
+            + ",".join(
+                payload
+                for url, payload in journal.completed("details").items()
+                if url not in existing_urls and payload is not None
+            )
+            + "]"
+        )
+        if journaled_details:
+            print(f"Resuming with {len(journaled_details)} details from the journal")
+            existing_details += journaled_details
+            existing_urls |= {apt.url for apt in journaled_details}
+
     # Filter apartments to only scrape new ones
     new_apartments = [apt for apt in apartments if apt.url not in existing_urls]
     print(
         f"Scraping {len(new_apartments)} new apartments out of {len(apartments)} total"
     )
 
-    # Scrape new apartment details
-    new_details: list[ApartmentDetails] = []
-    for i, apt in tqdm(enumerate(new_apartments), total=len(new_apartments)):
-        try:
-            details: ApartmentDetails | None = None
-            for scraper in scrapers:
-                if scraper.is_scraped_by_me(apt):
-                    # Use the scraper to get details for this apartment
-                    details = scraper.get_apartment_details(apt)
-                    break
-
-            if details is not None:
-                new_details.append(details)
-        except Exception as e:
-            logging.error(f"Error getting details for apartment {apt.url}: {e}")
+    # Scrape new apartment details, each scraper fetches its own apartments as a batch
+    new_details: list[CompactDetails] = []
+    for scraper in scrapers:
+        scraper_apartments = [
+            apt for apt in new_apartments if scraper.is_scraped_by_me(apt)
+        ]
+        if not scraper_apartments:
+            continue
+
+        # Checkpoint every few pages, so a crash loses at most one chunk
+        chunk_size = config.DETAIL_CHECKPOINT_EVERY
+        for i in range(0, len(scraper_apartments), chunk_size):
+            try:
+                details = scraper.get_apartment_details_batch(
+                    scraper_apartments[i : i + chunk_size]
+                )
+            except Exception as e:
+                logging.error(f"Error getting details from {scraper.portal}: {e}")
+                continue
+
+            chunk_details = [d for d in details if d is not None]
+            new_details.extend(CompactDetails.from_model(d) for d in chunk_details)
+            if journal is not None:
+                journal.mark_many(
+                    [d.url for d in chunk_details],
+                    "details",
+                    [d.model_dump_json() for d in chunk_details],
+                )
 
     # Merge existing and new details
     all_details = existing_details + new_details
 
     # Store combined results
-    with open(output_file, "w", encoding="utf-8") as f:
-        json_string = apartment_detail_list_adapter.dump_json(all_details, indent=2)
-        f.write(json_string.decode("utf-8"))
+    write_json_records(
+        output_file, all_details, CompactDetails, compact=config.COMPACT_JSON_OUTPUT
+    )
 
     print(
         f"Saved {len(all_details)} apartment details ({len(new_details)} newly scraped)"
@@ -1,37 +1,97 @@
+import os
 import pandas as pd
+import config
 from models.apartment_models import ApartmentListing
 from models.scraper import Scraper
+from storage.run_journal import RunJournal
+from tasks.search_scheduler import scrape_search_profiles
+
+LISTING_COLUMNS = list(ApartmentListing.model_fields)
+# A listing whose overview card shows different values was edited by the landlord
+COMPARED_COLUMNS = ["title", "price", "location"]
+
+
+def merge_listings(
+    existing_df: pd.DataFrame | None, scraped_df: pd.DataFrame
+) -> tuple[pd.DataFrame, pd.Index]:
+    """Upsert scraped listings into the history, keyed by URL.
+
+    Returns only the delta, i.e. the rows that are new or whose overview card
+    changed, together with the URLs of the changed ones. The comparison is a
+    single aligned column operation, so its cost does not depend on looping over
+    the history row by row.
+    """
+    scraped = scraped_df.drop_duplicates(subset="url", keep="first").set_index("url")
+    if existing_df is None or existing_df.empty:
+        return scraped.reset_index()[LISTING_COLUMNS], pd.Index([])
+
+    existing = existing_df.drop_duplicates(subset="url", keep="last").set_index("url")
+    known = scraped.index.isin(existing.index)
+
+    known_scraped = scraped.loc[known, COMPARED_COLUMNS].fillna("").astype(str)
+    known_existing = (
+        existing.loc[known_scraped.index, COMPARED_COLUMNS].fillna("").astype(str)
+    )
+    changed = (known_scraped != known_existing).any(axis=1)
+    changed_urls = changed.index[changed.to_numpy()]
+
+    delta = scraped.loc[~known | scraped.index.isin(changed_urls)]
+    return delta.reset_index()[LISTING_COLUMNS], changed_urls
+
+
+def _append_rows(df: pd.DataFrame, output_file: str) -> None:
+    """Append rows to the listings CSV, which is read back with later rows winning"""
+    df.to_csv(
+        output_file, mode="a", index=False, header=not os.path.exists(output_file)
+    )
 
 
 def scrape_overview(
-    scrapers: list[Scraper], existing_df: pd.DataFrame | None
-) -> list[ApartmentListing]:
+    scrapers: list[Scraper],
+    existing_df: pd.DataFrame | None,
+    journal: RunJournal | None = None,
+) -> tuple[list[ApartmentListing], set[str]]:
+    """Scrape all search profiles and return the listings the next stages need.
+
+    These are the new and changed listings, plus (with a journal) listings of
+    earlier runs that never got their details scraped. The URLs of changed
+    listings are returned separately so their details are scraped again.
+    """
     print("Scraping apartment listings...")
-    new_apartments: list[ApartmentListing] = []
-    for scraper in scrapers:
-        new_apartments.extend(scraper.scrape_listings())
-
-    apartment_dicts = list(map(lambda x: x.model_dump(), new_apartments))
-
-    new_df = None
-    apartments_df = None
-    # Merge with existing apartments if any
-    if existing_df is not None and not existing_df.empty:
-        print(f"Found {len(new_apartments)} new apartments to add")
-        new_df = pd.DataFrame(apartment_dicts)
-        apartments_df = pd.concat([existing_df, new_df], ignore_index=True)
-        # Remove duplicates just in case
-        apartments_df = apartments_df.drop_duplicates(subset=["url"], keep="first")
-    else:
-        print(f"Found {len(new_apartments)} apartments")
-        new_df = pd.DataFrame(apartment_dicts)
-        apartments_df = new_df.copy()
-
-    # Save all listings
-    apartments_df.to_csv("output/apartments_basic.csv", index=False)
-
-    apartments = apartments_df.to_dict(orient="records")
-
-    print(f"Saved {len(apartments)} total listings to output/apartments_basic.csv")
-
-    return [ApartmentListing(**{str(k): v for k, v in d.items()}) for d in apartments]
+    scraped = scrape_search_profiles(scrapers, config.SEARCH_PROFILES)
+    scraped_df = pd.DataFrame(
+        [apt.model_dump() for apt in scraped], columns=LISTING_COLUMNS
+    )
+
+    delta_df, changed_urls = merge_listings(existing_df, scraped_df)
+    print(
+        f"Found {len(scraped_df)} listings, {len(delta_df) - len(changed_urls)} new "
+        f"and {len(changed_urls)} changed"
+    )
+
+    # Only the delta is written, the history file is never rewritten
+    output_file = "output/apartments_basic.csv"
+    if not delta_df.empty:
+        _append_rows(delta_df, output_file)
+    if journal is not None:
+        journal.mark_many(delta_df["url"].tolist(), "overview")
+    print(f"Appended {len(delta_df)} listings to {output_file}")
+
+    pending_df = delta_df
+    if journal is not None and existing_df is not None and not existing_df.empty:
+        detailed_urls = journal.completed_urls("details")
+        unfinished_df = existing_df.loc[
+            ~existing_df["url"].isin(detailed_urls)
+            & ~existing_df["url"].isin(delta_df["url"])
+        ]
+        if not unfinished_df.empty:
+            print(f"{len(unfinished_df)} earlier listings still need their details")
+            pending_df = pd.concat(
+                [delta_df, unfinished_df[LISTING_COLUMNS]], ignore_index=True
+            )
+
+    apartments = [
+        ApartmentListing.model_construct(**record)
+        for record in pending_df.fillna("").to_dict(orient="records")
+    ]
+    return apartments, set(changed_urls)
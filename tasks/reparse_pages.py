@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+import config
+from models.apartment_models import ApartmentDetails, ApartmentListing
+from models.compact_models import CompactDetails, compact_detail_list_adapter
+from scrapers import flatfox_parser, immoscout24_parser
+from storage.json_writer import write_json_records
+from storage.page_archive import ArchivedPage, PageArchive
+
+PARSERS = {
+    "flatfox": flatfox_parser,
+    "immoscout24": immoscout24_parser,
+}
+
+
+def _parse_page(
+    job: tuple[str, dict[str, Any], dict[str, Any]],
+) -> ApartmentDetails | None:
+    """Parse one archived detail page, runs in a worker process"""
+    archive_dir, page_dict, listing_dict = job
+    page = ArchivedPage(**page_dict)
+    try:
+        html = PageArchive(archive_dir).load(page)
+        return PARSERS[page.portal].parse_details(html, ApartmentListing(**listing_dict))
+    except Exception as e:
+        print(f"Error parsing archived page {page.url}: {e}")
+        return None
+
+
+def reparse_details(
+    archive: PageArchive,
+    listings: list[ApartmentListing],
+    workers: int | None = None,
+) -> list[ApartmentDetails]:
+    """Re-run the detail parsers over the latest archived page of every listing"""
+    print("Re-parsing archived detail pages")
+    start = time.perf_counter()
+
+    listings_by_url = {listing.url: listing for listing in listings}
+    jobs = []
+    for page in archive.pages(kind="detail"):
+        # Pages without a known listing get an empty one, the parser fills in the rest
+        listing = listings_by_url.get(page.url) or ApartmentListing(
+            title="", price="", location="", url=page.url
+        )
+        jobs.append((archive.directory, page.model_dump(), listing.model_dump()))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_parse_page, jobs, chunksize=32)
+        all_details = [details for details in results if details is not None]
+
+    # Only the re-parsed listings are replaced, details scraped before the archive
+    # existed and pages that failed to parse keep their earlier entry
+    output_file = "output/apartments_details.json"
+    reparsed = {
+        details.url: CompactDetails.from_model(details) for details in all_details
+    }
+    existing_details: list[CompactDetails] = []
+    if os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            existing_details = compact_detail_list_adapter.validate_json(f.read())
+    existing_urls = {details.url for details in existing_details}
+    merged_details = [
+        reparsed.get(details.url, details) for details in existing_details
+    ] + [details for url, details in reparsed.items() if url not in existing_urls]
+    write_json_records(
+        output_file, merged_details, CompactDetails, compact=config.COMPACT_JSON_OUTPUT
+    )
+
+    print(
+        f"Re-parsed {len(all_details)} of {len(jobs)} archived pages "
+        f"in {time.perf_counter() - start:.2f}s, "
+        f"{len(merged_details) - len(reparsed)} other details kept"
+    )
+
+    return all_details
@@ -0,0 +1,102 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from models.apartment_models import ApartmentListing
+from models.scraper import Scraper
+
+
+class ScraperPool:
+    """Hands out browser sessions per portal, opening extra ones on demand.
+
+    The scrapers passed in are reused first; any extra session is a new instance
+    of the same scraper class sharing the known URLs and page archive, and is
+    closed again by `close`. With persistent browser profiles, there are no extra
+    sessions, since the portal's profile can't be opened twice.
+    """
+
+    def __init__(self, scrapers: list[Scraper]):
+        self.templates = {scraper.portal: scraper for scraper in scrapers}
+        self.idle: dict[str, queue.SimpleQueue[Scraper]] = {}
+        for scraper in scrapers:
+            self.idle.setdefault(scraper.portal, queue.SimpleQueue()).put(scraper)
+        self.created: list[Scraper] = []
+        self.lock = threading.Lock()
+
+    def acquire(self, portal: str) -> Scraper:
+        if config.PERSISTENT_BROWSER_PROFILE:
+            # A profile directory can only be open in one Edge instance at a time,
+            # so each portal keeps its single session and profiles wait for it
+            return self.idle[portal].get()
+        try:
+            return self.idle[portal].get_nowait()
+        except queue.Empty:
+            template = self.templates[portal]
+            scraper = type(template)(
+                existing_urls=template.existing_urls,
+                block_resources=getattr(template, "block_resources", None),
+                archive=template.archive,
+            )
+            with self.lock:
+                self.created.append(scraper)
+            return scraper
+
+    def release(self, scraper: Scraper) -> None:
+        self.idle[scraper.portal].put(scraper)
+
+    def close(self) -> None:
+        for scraper in self.created:
+            scraper.close()
+
+
+def scrape_search_profiles(
+    scrapers: list[Scraper],
+    profiles: list[config.SearchProfile],
+    max_pages: int | None = None,
+    pool: ScraperPool | None = None,
+) -> list[ApartmentListing]:
+    """Scrape every search profile in parallel sessions and dedupe the results
+
+    Pass a long-lived `pool` to keep the extra browser sessions open between calls.
+    """
+    portals = {scraper.portal for scraper in scrapers}
+    profiles = [profile for profile in profiles if profile.portal in portals]
+    owns_pool = pool is None
+    session_pool = pool or ScraperPool(scrapers)
+
+    def scrape_profile(profile: config.SearchProfile) -> list[ApartmentListing]:
+        scraper = None
+        try:
+            # Starting an extra browser can fail, which only loses this profile
+            scraper = session_pool.acquire(profile.portal)
+            print(f"Scraping search profile {profile.name} ({profile.portal})")
+            scraper.recycle_browser_if_due()
+            return scraper.scrape_listings(profile.url, max_pages=max_pages)
+        except Exception as e:
+            print(f"Error scraping search profile {profile.name}: {e}")
+            if scraper is not None and not scraper.browser_responds():
+                scraper.restart_browser(f"hung on search profile {profile.name}")
+            return []
+        finally:
+            if scraper is not None:
+                session_pool.release(scraper)
+
+    try:
+        with ThreadPoolExecutor(max_workers=config.MAX_PARALLEL_BROWSERS) as executor:
+            results = list(executor.map(scrape_profile, profiles))
+    finally:
+        if owns_pool:
+            session_pool.close()
+
+    # Searches overlap (e.g. neighbouring bounding boxes), keep each listing once
+    apartments: dict[str, ApartmentListing] = {}
+    for listings in results:
+        for listing in listings:
+            apartments.setdefault(listing.url, listing)
+
+    total = sum(len(listings) for listings in results)
+    print(
+        f"Scraped {len(profiles)} search profiles: {total} listings, "
+        f"{len(apartments)} unique ({total - len(apartments)} duplicates dropped)"
+    )
+    return list(apartments.values())
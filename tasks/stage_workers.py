@@ -0,0 +1,230 @@
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+import pandas as pd
+
+import config
+from config import CRITERIA
+from image_analyzer import ImageAnalyzer
+from models.apartment_models import ApartmentDetails, ApartmentListing
+from models.compact_models import CompactDetails, compact_detail_list_adapter
+from models.job_queue import Job, JobQueue, JobStage
+from models.scraper import Scraper
+from storage.json_writer import write_json_records
+from storage.run_journal import RunJournal
+from tasks.analyze_listings import analyze_listing, analyze_listings
+from tasks.overview_scraping import scrape_overview
+
+# Every stage passes the listing on to the next one; only the overview stage
+# carries data in its jobs, the others read the listing's details from the journal.
+NEXT_STAGE: dict[JobStage, JobStage] = {
+    "details": "images",
+    "images": "vision",
+    "vision": "criteria",
+}
+
+
+def worker_name(stage: JobStage) -> str:
+    """Identifies a worker across machines in the queue's leases"""
+    return f"{socket.gethostname()}:{os.getpid()}:{stage}"
+
+
+def enqueue_overview(queue: JobQueue) -> None:
+    """Schedule a scrape of all search profiles"""
+    queue.enqueue("overview", datetime.now().isoformat())
+
+
+@contextmanager
+def _lease_kept(
+    queue: JobQueue, job: Job, worker: str, visibility_timeout: float
+) -> Iterator[None]:
+    """Renew the job's lease every third of its timeout while the block runs, so a
+    slow but healthy job isn't handed to another worker"""
+    stop = threading.Event()
+
+    def renew() -> None:
+        while not stop.wait(visibility_timeout / 3):
+            try:
+                if not queue.extend(job, worker, visibility_timeout):
+                    logging.warning(f"Lost the lease of {job.stage} job {job.key}")
+                    return
+            except Exception as e:
+                logging.warning(f"Error renewing the lease of job {job.key}: {e}")
+
+    heartbeat = threading.Thread(target=renew, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def work(
+    queue: JobQueue,
+    stage: JobStage,
+    handle: Callable[[Job], None],
+    on_idle: Optional[Callable[[], None]] = None,
+    exit_when_idle: bool = False,
+) -> None:
+    """Take the jobs of one stage from the queue and run `handle` on each.
+
+    The job's lease is renewed while `handle` runs, so the visibility timeout
+    only has to cover a worker that stopped responding. A job that raises is
+    released for another attempt. `on_idle` runs once the queue runs dry after
+    some jobs were done, e.g. to write the output files.
+    """
+    worker = worker_name(stage)
+    visibility_timeout = config.JOB_VISIBILITY_TIMEOUT_SECONDS[stage]
+    done = failed = 0
+    done_since_idle = 0
+    print(f"Worker {worker} started")
+
+    try:
+        while True:
+            jobs = queue.lease(stage, worker, visibility_timeout)
+            if not jobs:
+                if done_since_idle and on_idle is not None:
+                    on_idle()
+                done_since_idle = 0
+                if exit_when_idle:
+                    break
+                time.sleep(config.WORKER_POLL_SECONDS)
+                continue
+
+            job = jobs[0]
+            try:
+                with _lease_kept(queue, job, worker, visibility_timeout):
+                    handle(job)
+            except Exception as e:
+                logging.error(
+                    f"{stage} job {job.key} failed (attempt {job.attempts}): {e}"
+                )
+                queue.fail(job, worker, str(e))
+                failed += 1
+                continue
+            queue.complete(job, worker)
+            done += 1
+            done_since_idle += 1
+    except KeyboardInterrupt:
+        print(f"Stopping worker {worker}")
+    finally:
+        print(f"Worker {worker}: {done} jobs done, {failed} failed")
+
+
+def _journaled_details(journal: RunJournal, url: str) -> ApartmentDetails:
+    payload = journal.payload(url, "details")
+    if payload is None:
+        raise ValueError(f"No details of {url} in the journal")
+    return ApartmentDetails.model_validate_json(payload)
+
+
+def overview_job(
+    job: Job,
+    queue: JobQueue,
+    scrapers: list[Scraper],
+    existing_df: pd.DataFrame | None,
+    journal: RunJournal,
+) -> None:
+    """Scrape the search profiles and queue the listings that need details"""
+    apartments, _ = scrape_overview(scrapers, existing_df, journal)
+    # Changed listings are queued again, which redoes their later stages too
+    for apartment in apartments:
+        queue.enqueue("details", apartment.url, apartment.model_dump_json())
+    print(f"Queued {len(apartments)} listings for their details")
+
+
+def details_job(
+    job: Job, queue: JobQueue, scrapers: list[Scraper], journal: RunJournal
+) -> None:
+    apartment = ApartmentListing.model_validate_json(job.payload or "")
+    scraper = next((s for s in scrapers if s.is_scraped_by_me(apartment)), None)
+    if scraper is None:
+        raise ValueError(f"No scraper for {apartment.url}")
+
+    # The scraper's batch fetch takes the HTTP fast path where it has one
+    details = scraper.get_apartment_details_batch([apartment])[0]
+    if details is None:
+        raise ValueError(f"Failed to fetch the details of {apartment.url}")
+    journal.mark(apartment.url, "details", details.model_dump_json())
+    # An earlier analysis belongs to the listing as it was before
+    journal.reset([apartment.url], ["criteria"])
+    queue.enqueue(NEXT_STAGE["details"], apartment.url)
+
+
+def images_job(
+    job: Job, queue: JobQueue, journal: RunJournal, image_analyzer: ImageAnalyzer
+) -> None:
+    apartment = _journaled_details(journal, job.key)
+    fetched = image_analyzer.fetch_images(apartment.image_urls)
+    print(f"Fetched {fetched} of {len(apartment.image_urls)} images of {job.key}")
+    queue.enqueue(NEXT_STAGE["images"], job.key)
+
+
+def vision_job(
+    job: Job, queue: JobQueue, journal: RunJournal, image_analyzer: ImageAnalyzer
+) -> None:
+    """Extract the image attributes, which the analyzer journals per image"""
+    apartment = _journaled_details(journal, job.key)
+    decided = image_analyzer.decide_by_text(apartment)
+    image_analyzer.image_attributes(
+        apartment.image_urls, [key for key in CRITERIA if key not in decided]
+    )
+    queue.enqueue(NEXT_STAGE["vision"], job.key)
+
+
+def criteria_job(
+    job: Job, queue: JobQueue, journal: RunJournal, image_analyzer: ImageAnalyzer
+) -> None:
+    """Answer the criteria, with the image attributes restored from the journal"""
+    apartment = _journaled_details(journal, job.key)
+    result = analyze_listing(apartment, image_analyzer)
+    # No criterion answered means the backend call failed
+    if not result.filter_result.decided_by:
+        raise ValueError(f"Failed to analyze {job.key}")
+    journal.mark(
+        job.key,
+        "criteria",
+        result.model_dump_json(),
+        version=image_analyzer.criteria_version(),
+    )
+
+
+def export_results(journal: RunJournal, image_analyzer: ImageAnalyzer) -> None:
+    """Write the output files of a single-process run for the analysed listings.
+
+    Details in the journal replace those in the details file, and the analyses
+    are restored from the journal, so no listing is analysed here.
+    """
+    output_file = "output/apartments_details.json"
+    journaled = {
+        url: payload
+        for url, payload in journal.completed("details").items()
+        if payload is not None
+    }
+    details = compact_detail_list_adapter.validate_json(
+        "[" + ",".join(journaled.values()) + "]"
+    )
+    if os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            details = [
+                d
+                for d in compact_detail_list_adapter.validate_json(f.read())
+                if d.url not in journaled
+            ] + details
+    write_json_records(
+        output_file, details, CompactDetails, compact=config.COMPACT_JSON_OUTPUT
+    )
+
+    analysed_urls = journal.completed_urls(
+        "criteria", version=image_analyzer.criteria_version()
+    )
+    analyze_listings(
+        [d for d in details if d.url in analysed_urls], image_analyzer, journal
+    )
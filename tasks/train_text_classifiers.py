@@ -0,0 +1,93 @@
+import time
+import config
+from config import CRITERIA
+from inference.text_classifier import TextClassifier, listing_text
+from models.apartment_models import ApartmentAnalyzed
+from storage.run_journal import RunJournal
+
+
+def _llm_label(result: ApartmentAnalyzed, criterion: str) -> bool | None:
+    """The LLM's answer to a criterion, None if the LLM didn't answer it"""
+    decided_by = result.filter_result.decided_by
+    if decided_by:
+        # Never learn from the classifier's own answers
+        if decided_by.get(criterion) != "llm":
+            return None
+    elif not CRITERIA[criterion].use_image_analysis:
+        # Before decided_by was recorded, only image criteria were put to the LLM
+        return None
+    return result.filter_result.criteria_results.get(criterion)
+
+
+def train_text_classifiers(journal: RunJournal) -> TextClassifier:
+    """Distil the journaled LLM answers into text classifiers and save them.
+
+    Each text-decidable criterion with enough labels of both answers is first
+    evaluated on a held-out fifth of the listings, reporting how many listings
+    it answers at the configured threshold and how often those answers agree
+    with the LLM, and then trained on all labels.
+    """
+    from sklearn.model_selection import train_test_split
+
+    results = [
+        ApartmentAnalyzed.model_validate_json(payload)
+        for payload in journal.latest_payloads("criteria").values()
+        if payload is not None
+    ]
+    print(f"Loaded {len(results)} analysed listings from the journal")
+
+    classifier = TextClassifier(threshold=config.TEXT_CLASSIFIER_THRESHOLD)
+    for criterion, value in CRITERIA.items():
+        if not value.text_decidable:
+            continue
+
+        texts, labels = [], []
+        for result in results:
+            label = _llm_label(result, criterion)
+            if label is not None:
+                texts.append(listing_text(result))
+                labels.append(label)
+
+        positives = sum(labels)
+        negatives = len(labels) - positives
+        if min(positives, negatives) < config.TEXT_CLASSIFIER_MIN_EXAMPLES:
+            print(
+                f"{criterion}: skipped, {positives} yes and {negatives} no labels "
+                "are too few"
+            )
+            continue
+
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=0.2, stratify=labels, random_state=0
+        )
+        held_out = TextClassifier(threshold=config.TEXT_CLASSIFIER_THRESHOLD)
+        held_out.fit(criterion, train_texts, train_labels)
+        answers = [
+            (decided[criterion], label)
+            for decided, label in zip(held_out.predict_texts(test_texts), test_labels)
+            if criterion in decided
+        ]
+        agreement = sum(answer == label for answer, label in answers)
+        print(
+            f"{criterion}: {len(labels)} labels, answers "
+            f"{len(answers) / len(test_labels):.0%} of held-out listings, "
+            f"{agreement / max(len(answers), 1):.1%} agree with the LLM"
+        )
+
+        classifier.fit(criterion, texts, labels)
+
+    if not classifier.models:
+        print("No classifier trained, keeping the previous ones")
+        return classifier
+
+    texts = [listing_text(result) for result in results]
+    start = time.perf_counter()
+    classifier.predict_texts(texts)
+    elapsed = time.perf_counter() - start
+    print(f"Classifies {len(texts) / max(elapsed, 1e-9):.0f} listings per second")
+
+    classifier.save(config.TEXT_CLASSIFIER_FILE)
+    print(
+        f"Saved {len(classifier.models)} classifiers to {config.TEXT_CLASSIFIER_FILE}"
+    )
+    return classifier
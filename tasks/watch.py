@@ -0,0 +1,130 @@
+import csv
+import os
+import statistics
+import time
+from datetime import datetime
+import config
+from image_analyzer import ImageAnalyzer
+from models.apartment_models import ApartmentListing
+from models.scraper import Scraper
+from storage.run_journal import RunJournal
+from tasks.analyze_listings import analyze_listings
+from tasks.detail_scraping import scrape_details
+from tasks.search_scheduler import ScraperPool, scrape_search_profiles
+
+
+def _append_listings(apartments: list[ApartmentListing]) -> None:
+    """Add new listings to apartments_basic.csv without rewriting it"""
+    output_file = "output/apartments_basic.csv"
+    write_header = not os.path.exists(output_file)
+    with open(output_file, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(ApartmentListing.model_fields))
+        if write_header:
+            writer.writeheader()
+        writer.writerows(apt.model_dump() for apt in apartments)
+
+
+def _record_latency(
+    apartments: list[ApartmentListing],
+    journal: RunJournal,
+    criteria_version: str,
+) -> list[float]:
+    """Log the time from first sighting to analysis of every new listing.
+
+    The portals' overview pages carry no publication time, so the first poll that
+    saw a listing stands in for "published"; the error is at most one interval.
+    """
+    write_header = not os.path.exists(config.WATCH_LATENCY_LOG)
+    latencies = []
+    with open(config.WATCH_LATENCY_LOG, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(["url", "first_seen", "analysed", "latency_seconds"])
+        for apt in apartments:
+            first_seen = journal.completed_at(apt.url, "overview")
+            analysed = journal.completed_at(
+                apt.url, "criteria", version=criteria_version
+            )
+            if first_seen is None or analysed is None:
+                continue
+            latency = (analysed - first_seen).total_seconds()
+            latencies.append(latency)
+            writer.writerow(
+                [apt.url, first_seen.isoformat(), analysed.isoformat(), latency]
+            )
+    return latencies
+
+
+def watch(
+    scrapers: list[Scraper],
+    existing_urls: set[str],
+    image_analyzer: ImageAnalyzer,
+    journal: RunJournal,
+) -> None:
+    """Poll all search profiles forever, pushing only unseen listings through
+
+    Browsers and the model stay up between polls. The poll interval grows while
+    nothing new shows up and resets as soon as a new listing appears.
+    """
+    pool = ScraperPool(scrapers)
+    interval = config.WATCH_INTERVAL_SECONDS
+
+    try:
+        while True:
+            poll_start = time.perf_counter()
+            print(f"\n[{datetime.now():%H:%M:%S}] Polling search profiles...")
+
+            # The scrapers return known listings too, only unseen ones are processed
+            new_apartments = [
+                apt
+                for apt in scrape_search_profiles(
+                    scrapers,
+                    config.SEARCH_PROFILES,
+                    max_pages=config.WATCH_PAGES,
+                    pool=pool,
+                )
+                if apt.url not in existing_urls
+            ]
+
+            if new_apartments:
+                journal.mark_many([apt.url for apt in new_apartments], "overview")
+                _append_listings(new_apartments)
+                existing_urls.update(apt.url for apt in new_apartments)
+
+                apartment_details = scrape_details(scrapers, new_apartments, journal)
+                # Only the new listings are analysed, the rest of the history keeps
+                # its entries in the output files
+                new_urls = {apt.url for apt in new_apartments}
+                analyze_listings(
+                    [d for d in apartment_details if d.url in new_urls],
+                    image_analyzer,
+                    journal,
+                    merge=True,
+                )
+
+                latencies = _record_latency(
+                    new_apartments, journal, image_analyzer.criteria_version()
+                )
+                if latencies:
+                    print(
+                        f"{len(latencies)} new listings analysed, latency from first "
+                        f"sighting: median {statistics.median(latencies):.0f}s, "
+                        f"max {max(latencies):.0f}s"
+                    )
+                interval = config.WATCH_INTERVAL_SECONDS
+            else:
+                interval = min(
+                    interval * config.WATCH_BACKOFF_FACTOR,
+                    config.WATCH_MAX_INTERVAL_SECONDS,
+                )
+
+            poll_seconds = time.perf_counter() - poll_start
+            print(
+                f"Poll took {poll_seconds:.0f}s, found {len(new_apartments)} new "
+                f"listings, next poll in {interval:.0f}s"
+            )
+            time.sleep(max(0.0, interval - poll_seconds))
+    except KeyboardInterrupt:
+        print("Stopping watch mode")
+    finally:
+        pool.close()
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import os
-import sys
 
 # Set page configuration
 st.set_page_config(page_title="Apartment Browser", page_icon="🏢", layout="wide")
@@ -12,8 +11,12 @@ csv_path = os.path.join(
 )
 
 
-def load_data():
-    """Load the apartment data from CSV file"""
+@st.cache_data
+def load_data(modified: float):
+    """Load the apartment data from CSV file, cached across reruns of the script.
+
+    `modified` is the file's modification time, so a rewritten file is reloaded.
+    """
     try:
         df = pd.read_csv(csv_path)
         # Convert price to numeric (remove CHF and apostrophes)
@@ -37,7 +40,10 @@ def main():
     st.write("Browse and filter available apartments")
 
     # Load data
-    df = load_data()
+    if not os.path.exists(csv_path):
+        st.warning("No apartment data available")
+        return
+    df = load_data(os.path.getmtime(csv_path))
 
     if df.empty:
         st.warning("No apartment data available")